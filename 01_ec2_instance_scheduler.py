@@ -3,6 +3,34 @@ import json
 import os
 from datetime import datetime
 
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region)
+    return _clients[key]
+
+# Tag names holding the time and days for each scheduled action
+SCHEDULE_TAGS = {
+    'start': ('AutoStart', 'AutoStartDays'),
+    'stop': ('AutoStop', 'AutoStopDays')
+}
+
+# Instance state an instance must be in for each scheduled action to apply
+ACTION_SOURCE_STATES = {
+    'start': 'stopped',
+    'stop': 'running'
+}
+
+# Day names accepted in the days tags, as used by EventBridge cron expressions
+CRON_DAYS = {'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN'}
+
+# Maximum number of instance IDs sent in one StartInstances/StopInstances request
+MAX_INSTANCE_IDS_PER_CALL = 1000
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to start or stop EC2 instances based on tags.
@@ -13,12 +41,33 @@ def lambda_handler(event, context):
     - 'AutoStartDays': Contains days to start (format: Mon,Tue,Wed,Thu,Fri,Sat,Sun)
     - 'AutoStopDays': Contains days to stop (format: Mon,Tue,Wed,Thu,Fri,Sat,Sun)
     
+    Supported events:
+    - {"action": "sync_schedules"}: Creates one EventBridge cron rule per unique
+      schedule found in the tags (and removes stale ones), each targeting this function
+    - {"action": "start"|"stop", "time": "HH:MM", "days": "Mon,Tue"}: Sent by those
+      rules; starts or stops only the instances tagged with that schedule, ignoring
+      differences in case and spacing
+    - Any other event falls back to comparing the tags against the current time,
+      which requires invoking the function every minute
+    
+    Schedule times are interpreted in UTC.
+    
     Environment Variables:
     - REGION: AWS region to operate in (default: us-east-1)
+    - SCHEDULE_RULE_PREFIX: Name prefix for the EventBridge rules (default: 'ec2-scheduler')
     """
     # Get AWS region from environment variable or use default
     region = os.environ.get('REGION', 'us-east-1')
-    ec2 = boto3.resource('ec2', region_name=region)
+    rule_prefix = os.environ.get('SCHEDULE_RULE_PREFIX', 'ec2-scheduler')
+    ec2 = _client('ec2', region)
+    
+    action = event.get('action') if isinstance(event, dict) else None
+    
+    if action == 'sync_schedules':
+        return sync_schedule_rules(ec2, region, rule_prefix, context.invoked_function_arn)
+    
+    if action in SCHEDULE_TAGS:
+        return run_scheduled_action(ec2, action, event['time'], event['days'])
     
     # Get current time and day
     now = datetime.now()
@@ -28,34 +77,25 @@ def lambda_handler(event, context):
     instances_started = []
     instances_stopped = []
     
-    # Find instances with scheduling tags
-    instances = ec2.instances.filter(
-        Filters=[
-            {'Name': 'tag-key', 'Values': ['AutoStart', 'AutoStop']}
-        ]
-    )
-    
-    for instance in instances:
-        instance_id = instance.id
-        tags = {tag['Key']: tag['Value'] for tag in instance.tags or []}
+    # Only fetch instances due now and in the right state for the action
+    for action, (time_tag, days_tag) in SCHEDULE_TAGS.items():
+        due_instance_ids = []
         
-        # Check for start time
-        if 'AutoStart' in tags and 'AutoStartDays' in tags:
-            start_time = tags['AutoStart']
-            start_days = tags['AutoStartDays'].split(',')
+        for instance in describe_instances(ec2, [
+            {'Name': f'tag:{time_tag}', 'Values': [current_time]},
+            {'Name': 'instance-state-name', 'Values': [ACTION_SOURCE_STATES[action]]}
+        ]):
+            tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
             
-            if current_time == start_time and current_day in start_days and instance.state['Name'] == 'stopped':
-                instance.start()
-                instances_started.append(instance_id)
+            if days_tag in tags and current_day in tags[days_tag].split(','):
+                due_instance_ids.append(instance['InstanceId'])
         
-        # Check for stop time
-        if 'AutoStop' in tags and 'AutoStopDays' in tags:
-            stop_time = tags['AutoStop']
-            stop_days = tags['AutoStopDays'].split(',')
-            
-            if current_time == stop_time and current_day in stop_days and instance.state['Name'] == 'running':
-                instance.stop()
-                instances_stopped.append(instance_id)
+        change_instance_states(ec2, action, due_instance_ids)
+        
+        if action == 'start':
+            instances_started = due_instance_ids
+        else:
+            instances_stopped = due_instance_ids
     
     return {
         'statusCode': 200,
@@ -63,4 +103,141 @@ def lambda_handler(event, context):
             'instances_started': instances_started,
             'instances_stopped': instances_stopped
         })
-    }
\ No newline at end of file
+    }
+
+def run_scheduled_action(ec2, action, schedule_time, schedule_days):
+    """Start or stop the instances whose tags describe the given schedule"""
+    time_tag, days_tag = SCHEDULE_TAGS[action]
+    schedule = parse_schedule(schedule_time, schedule_days)
+    
+    # Filter server-side on the schedule tags being present and the instance state, then
+    # compare the normalized schedules so differently spelled tags still match
+    instance_ids = []
+    for instance in describe_instances(ec2, [
+        {'Name': 'tag-key', 'Values': [time_tag]},
+        {'Name': 'instance-state-name', 'Values': [ACTION_SOURCE_STATES[action]]}
+    ]):
+        tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+        if schedule and days_tag in tags and parse_schedule(tags[time_tag], tags[days_tag]) == schedule:
+            instance_ids.append(instance['InstanceId'])
+    
+    change_instance_states(ec2, action, instance_ids)
+    
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'instances_started': instance_ids if action == 'start' else [],
+            'instances_stopped': instance_ids if action == 'stop' else []
+        })
+    }
+
+def parse_schedule(schedule_time, schedule_days):
+    """Return the normalized (hour, minute, days) of a schedule, or None if it is invalid"""
+    try:
+        hour, minute = (int(part) for part in schedule_time.split(':'))
+    except ValueError:
+        return None
+    
+    days = tuple(day.strip().upper() for day in schedule_days.split(',') if day.strip())
+    if not (0 <= hour <= 23 and 0 <= minute <= 59) or not days or not CRON_DAYS.issuperset(days):
+        return None
+    return hour, minute, days
+
+def sync_schedule_rules(ec2, region, rule_prefix, function_arn):
+    """Create an EventBridge cron rule for every tagged schedule and delete stale rules"""
+    events = _client('events', region)
+    lambda_client = _client('lambda', region)
+    
+    # Collect the unique schedules from the instance tags
+    schedules = {}
+    for instance in describe_instances(ec2, [
+        {'Name': 'tag-key', 'Values': ['AutoStart', 'AutoStop']}
+    ]):
+        tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+        
+        for action, (time_tag, days_tag) in SCHEDULE_TAGS.items():
+            if time_tag not in tags or days_tag not in tags:
+                continue
+            
+            # Skip schedules that would not make a valid cron expression
+            schedule = parse_schedule(tags[time_tag], tags[days_tag])
+            if schedule is None:
+                continue
+            
+            hour, minute, days = schedule
+            rule_name = f"{rule_prefix}-{action}-{hour:02d}{minute:02d}-{'-'.join(days)}"
+            
+            schedules[rule_name] = {
+                'expression': f"cron({minute} {hour} ? * {','.join(days)} *)",
+                'input': {'action': action, 'time': f"{hour:02d}:{minute:02d}", 'days': ','.join(days)}
+            }
+    
+    rules_created = []
+    for rule_name, schedule in schedules.items():
+        rule_arn = events.put_rule(
+            Name=rule_name,
+            ScheduleExpression=schedule['expression'],
+            State='ENABLED',
+            Description='EC2 instance schedule managed by the EC2 instance scheduler'
+        )['RuleArn']
+        
+        events.put_targets(
+            Rule=rule_name,
+            Targets=[{
+                'Id': 'ec2-scheduler',
+                'Arn': function_arn,
+                'Input': json.dumps(schedule['input'])
+            }]
+        )
+        rules_created.append(rule_name)
+    
+    # Allow all managed rules to invoke this function
+    if schedules:
+        try:
+            lambda_client.add_permission(
+                FunctionName=function_arn,
+                StatementId=f"{rule_prefix}-events",
+                Action='lambda:InvokeFunction',
+                Principal='events.amazonaws.com',
+                SourceArn=rule_arn.rsplit('/', 1)[0] + f"/{rule_prefix}-*"
+            )
+        except lambda_client.exceptions.ResourceConflictException:
+            # Permission already granted
+            pass
+    
+    # Remove rules for schedules that are no longer tagged on any instance
+    rules_deleted = []
+    paginator = events.get_paginator('list_rules')
+    for page in paginator.paginate(NamePrefix=f"{rule_prefix}-"):
+        for rule in page['Rules']:
+            if rule['Name'] in schedules:
+                continue
+            
+            events.remove_targets(Rule=rule['Name'], Ids=['ec2-scheduler'])
+            events.delete_rule(Name=rule['Name'])
+            rules_deleted.append(rule['Name'])
+    
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'rules_synced': rules_created,
+            'rules_deleted': rules_deleted
+        })
+    }
+
+def describe_instances(ec2, filters):
+    """Yield every instance matching the given filters across all result pages"""
+    paginator = ec2.get_paginator('describe_instances')
+    for page in paginator.paginate(Filters=filters):
+        for reservation in page['Reservations']:
+            yield from reservation['Instances']
+
+def change_instance_states(ec2, action, instance_ids):
+    """Start or stop instances with as few bulk API calls as possible"""
+    for i in range(0, len(instance_ids), MAX_INSTANCE_IDS_PER_CALL):
+        batch = instance_ids[i:i + MAX_INSTANCE_IDS_PER_CALL]
+        
+        if action == 'start':
+            ec2.start_instances(InstanceIds=batch)
+        else:
+            ec2.stop_instances(InstanceIds=batch)
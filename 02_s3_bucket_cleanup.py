@@ -1,77 +1,225 @@
 import boto3
 import json
 import os
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region)
+    return _clients[key]
+
+# ID of the lifecycle rule managed by this function
+LIFECYCLE_RULE_ID = 'auto-retention'
 
 def lambda_handler(event, context):
     """
-    AWS Lambda function to clean up S3 buckets by deleting objects older than a specified age.
+    AWS Lambda function to clean up S3 buckets by expiring objects older than a specified age.
     
-    This function scans specified S3 buckets and deletes objects that are older than
-    the retention period defined in environment variables or bucket tags.
+    By default this function installs an S3 Lifecycle expiration rule on each bucket
+    matching the retention period defined in environment variables or bucket tags, so
+    S3 deletes expired objects server-side. The rule is only written when it differs
+    from the one already on the bucket; other lifecycle rules are left untouched.
+    Set CLEANUP_MODE to 'delete' to list and delete expired objects directly instead.
     
     Environment Variables:
     - DEFAULT_RETENTION_DAYS: Default number of days to retain objects (default: 30)
     - TARGET_BUCKETS: Comma-separated list of bucket names to clean up (optional)
     - RETENTION_TAG: Name of the tag that specifies retention period (default: 'RetentionDays')
+    - CLEANUP_MODE: 'lifecycle' to manage expiration rules or 'delete' to delete objects (default: 'lifecycle')
+    - USE_BUCKET_TAGS: Set to 'false' to apply DEFAULT_RETENTION_DAYS to every bucket
+      without reading retention tags (default: 'true')
+    - MAX_WORKERS: Maximum number of buckets processed concurrently (default: 16)
+    
+    Retention tags are read with the Resource Groups Tagging API in each region that holds
+    buckets, as reported by ListBuckets, which requires the tag:GetResources permission.
+    Buckets whose region cannot be queried that way fall back to s3:GetBucketTagging.
     """
     # Get configuration from environment variables
     default_retention_days = int(os.environ.get('DEFAULT_RETENTION_DAYS', '30'))
     retention_tag = os.environ.get('RETENTION_TAG', 'RetentionDays')
     target_buckets = os.environ.get('TARGET_BUCKETS', '')
+    cleanup_mode = os.environ.get('CLEANUP_MODE', 'lifecycle')
+    use_bucket_tags = os.environ.get('USE_BUCKET_TAGS', 'true').lower() == 'true'
+    max_workers = int(os.environ.get('MAX_WORKERS', 16))
     
-    s3_client = boto3.client('s3')
-    s3_resource = boto3.resource('s3')
+    s3_client = _client('s3')
+    
+    # Get list of buckets to process; the listing also reports the region of each bucket
+    bucket_regions = {}
+    if use_bucket_tags or not target_buckets:
+        response = s3_client.list_buckets()
+        bucket_regions = {bucket['Name']: bucket.get('BucketRegion') for bucket in response['Buckets']}
     
-    # Get list of buckets to process
-    buckets_to_process = []
     if target_buckets:
         buckets_to_process = target_buckets.split(',')
     else:
-        response = s3_client.list_buckets()
-        buckets_to_process = [bucket['Name'] for bucket in response['Buckets']]
+        buckets_to_process = list(bucket_regions)
     
-    deletion_results = {}
+    # Look up retention tags with one pass per region instead of one call per bucket
+    tagged_retention_days = {}
+    if use_bucket_tags:
+        tagged_retention_days = get_tagged_retention_days(
+            {name: bucket_regions.get(name) for name in buckets_to_process}, retention_tag
+        )
     
-    for bucket_name in buckets_to_process:
+    def clean_bucket(bucket_name):
         try:
-            # Check if bucket has a custom retention policy tag
-            retention_days = default_retention_days
-            try:
-                bucket_tagging = s3_client.get_bucket_tagging(Bucket=bucket_name)
-                for tag in bucket_tagging['TagSet']:
-                    if tag['Key'] == retention_tag and tag['Value'].isdigit():
-                        retention_days = int(tag['Value'])
-            except s3_client.exceptions.ClientError:
-                # Bucket might not have tags
-                pass
-            
-            # Calculate cutoff date
-            cutoff_date = datetime.now() - timedelta(days=retention_days)
-            
-            # Get and delete old objects
-            bucket = s3_resource.Bucket(bucket_name)
-            deleted_count = 0
+            # Check if bucket has a custom retention policy tag, reading the bucket's own
+            # tags when its region was not covered by the tagging API lookup
+            retention_days = None
+            if bucket_name in tagged_retention_days:
+                retention_days = tagged_retention_days[bucket_name]
+            elif use_bucket_tags:
+                retention_days = get_bucket_retention_days(s3_client, bucket_name, retention_tag)
+            if retention_days is None:
+                retention_days = default_retention_days
             
-            for obj in bucket.objects.all():
-                if obj.last_modified < cutoff_date:
-                    obj.delete()
-                    deleted_count += 1
-            
-            deletion_results[bucket_name] = {
-                'retention_days': retention_days,
-                'deleted_objects': deleted_count
-            }
+            if cleanup_mode == 'delete':
+                # Calculate cutoff date
+                cutoff_date = datetime.now(timezone.utc) - timedelta(days=retention_days)
+                
+                # Get and delete old objects
+                deleted_count = delete_objects_older_than(s3_client, bucket_name, cutoff_date)
+                
+                return {
+                    'retention_days': retention_days,
+                    'deleted_objects': deleted_count
+                }
+            else:
+                # Let S3 expire old objects server-side
+                return {
+                    'retention_days': retention_days,
+                    'lifecycle_rule': apply_retention_lifecycle_rule(s3_client, bucket_name, retention_days)
+                }
             
         except Exception as e:
-            deletion_results[bucket_name] = {
+            return {
                 'error': str(e)
             }
     
+    # Buckets are independent, so process them concurrently
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        deletion_results = dict(zip(buckets_to_process, executor.map(clean_bucket, buckets_to_process)))
+    
     return {
         'statusCode': 200,
         'body': json.dumps({
             'message': 'S3 bucket cleanup completed',
             'results': deletion_results
         })
-    }
\ No newline at end of file
+    }
+
+def get_tagged_retention_days(bucket_regions, retention_tag):
+    """
+    Return the retention period of every bucket whose region could be searched with the
+    tagging API, or None for those without a valid retention tag
+    """
+    # The tagging API is regional, so group the buckets by the region they live in
+    buckets_by_region = {}
+    for bucket_name, region in bucket_regions.items():
+        if region:
+            buckets_by_region.setdefault(region, []).append(bucket_name)
+    
+    retention_days = {}
+    for region, region_buckets in buckets_by_region.items():
+        try:
+            region_retention_days = get_region_tagged_retention_days(region, retention_tag)
+        except Exception as e:
+            # Leave the region's buckets out so they fall back to reading their own tags
+            print(f"Error reading retention tags in {region}: {str(e)}")
+            continue
+        
+        for bucket_name in region_buckets:
+            retention_days[bucket_name] = region_retention_days.get(bucket_name)
+    
+    return retention_days
+
+def get_region_tagged_retention_days(region, retention_tag):
+    """Return the retention period of every bucket in the region carrying a valid retention tag"""
+    tagging = _client('resourcegroupstaggingapi', region)
+    paginator = tagging.get_paginator('get_resources')
+    retention_days = {}
+    
+    for page in paginator.paginate(ResourceTypeFilters=['s3'], TagFilters=[{'Key': retention_tag}]):
+        for resource in page['ResourceTagMappingList']:
+            bucket_name = resource['ResourceARN'].split(':::')[-1]
+            for tag in resource['Tags']:
+                if tag['Key'] == retention_tag and tag['Value'].isdigit():
+                    retention_days[bucket_name] = int(tag['Value'])
+    
+    return retention_days
+
+def get_bucket_retention_days(s3_client, bucket_name, retention_tag):
+    """Return the retention period from a bucket's own tags, or None if it has no valid retention tag"""
+    try:
+        tag_set = s3_client.get_bucket_tagging(Bucket=bucket_name)['TagSet']
+    except s3_client.exceptions.ClientError as e:
+        if e.response['Error']['Code'] != 'NoSuchTagSet':
+            raise
+        return None
+    
+    for tag in tag_set:
+        if tag['Key'] == retention_tag and tag['Value'].isdigit():
+            return int(tag['Value'])
+    return None
+
+def delete_objects_older_than(s3_client, bucket_name, cutoff_date):
+    """Delete objects last modified before cutoff_date in batches of up to 1000 keys"""
+    paginator = s3_client.get_paginator('list_objects_v2')
+    deleted_count = 0
+    
+    for page in paginator.paginate(Bucket=bucket_name, PaginationConfig={'PageSize': 1000}):
+        batch = [
+            {'Key': obj['Key']}
+            for obj in page.get('Contents', [])
+            if obj['LastModified'] < cutoff_date
+        ]
+        
+        if not batch:
+            continue
+        
+        response = s3_client.delete_objects(
+            Bucket=bucket_name,
+            Delete={'Objects': batch, 'Quiet': True}
+        )
+        
+        # In quiet mode only failed keys are reported back
+        deleted_count += len(batch) - len(response.get('Errors', []))
+    
+    return deleted_count
+
+def apply_retention_lifecycle_rule(s3_client, bucket_name, retention_days):
+    """Install or update the retention expiration rule on a bucket, returning the action taken"""
+    rule = {
+        'ID': LIFECYCLE_RULE_ID,
+        'Status': 'Enabled',
+        'Filter': {'Prefix': ''},
+        'Expiration': {'Days': retention_days}
+    }
+    
+    try:
+        existing_rules = s3_client.get_bucket_lifecycle_configuration(Bucket=bucket_name)['Rules']
+    except s3_client.exceptions.ClientError as e:
+        if e.response['Error']['Code'] != 'NoSuchLifecycleConfiguration':
+            raise
+        existing_rules = []
+    
+    other_rules = [r for r in existing_rules if r.get('ID') != LIFECYCLE_RULE_ID]
+    current_rule = next((r for r in existing_rules if r.get('ID') == LIFECYCLE_RULE_ID), None)
+    
+    if current_rule is not None and current_rule.get('Status') == 'Enabled' and \
+            current_rule.get('Expiration', {}).get('Days') == retention_days:
+        return 'unchanged'
+    
+    s3_client.put_bucket_lifecycle_configuration(
+        Bucket=bucket_name,
+        LifecycleConfiguration={'Rules': other_rules + [rule]}
+    )
+    
+    return 'updated' if current_rule is not None else 'created'
@@ -2,9 +2,32 @@ import boto3
 import json
 import os
 import gzip
+import time
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from io import BytesIO
 
+# Adaptive retries absorb throttling and short export-task quota contention
+CLIENT_CONFIG = Config(retries={'max_attempts': 10, 'mode': 'adaptive'})
+
+# Export tasks are created without client retries so only the deadline-aware backoff
+# waits for the account's export slot
+EXPORT_CLIENT_CONFIG = Config(retries={'max_attempts': 1, 'mode': 'standard'})
+
+# Seconds kept free before the Lambda timeout when waiting for an export slot
+TIMEOUT_MARGIN_SECONDS = 10
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None, config=CLIENT_CONFIG):
+    """Return a boto3 client for the service, region and configuration, creating it on first use"""
+    key = (service_name, region, id(config))
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=config)
+    return _clients[key]
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to export CloudWatch logs to S3.
@@ -12,12 +35,19 @@ def lambda_handler(event, context):
     This function exports logs from specified CloudWatch log groups to an S3 bucket.
     It can be scheduled to run periodically to archive logs.
     
+    When FIREHOSE_ARN is set, the function instead makes sure every log group has a
+    subscription filter streaming its events to that Kinesis Data Firehose delivery
+    stream (configured separately to deliver to S3), and no export tasks are created.
+    
     Environment Variables:
     - LOG_GROUPS: Comma-separated list of log group names to export
     - S3_BUCKET: Target S3 bucket for log exports
     - S3_PREFIX: Prefix for S3 objects (default: 'cloudwatch-logs/')
     - DAYS_AGO: Number of days in the past to start export (default: 1)
     - EXPORT_DURATION_HOURS: Duration of logs to export in hours (default: 24)
+    - FIREHOSE_ARN: Firehose delivery stream ARN to stream logs to (optional)
+    - SUBSCRIPTION_ROLE_ARN: IAM role CloudWatch Logs assumes to write to Firehose
+    - SUBSCRIPTION_FILTER_NAME: Name of the managed subscription filter (default: 'to-s3')
     """
     # Get configuration from environment variables
     log_groups_str = os.environ.get('LOG_GROUPS', '')
@@ -25,6 +55,30 @@ def lambda_handler(event, context):
     s3_prefix = os.environ.get('S3_PREFIX', 'cloudwatch-logs/')
     days_ago = int(os.environ.get('DAYS_AGO', 1))
     export_duration_hours = int(os.environ.get('EXPORT_DURATION_HOURS', 24))
+    firehose_arn = os.environ.get('FIREHOSE_ARN', '')
+    subscription_role_arn = os.environ.get('SUBSCRIPTION_ROLE_ARN', '')
+    filter_name = os.environ.get('SUBSCRIPTION_FILTER_NAME', 'to-s3')
+    
+    if firehose_arn:
+        if not log_groups_str or not subscription_role_arn:
+            return {
+                'statusCode': 400,
+                'body': json.dumps('Missing required environment variables: LOG_GROUPS and SUBSCRIPTION_ROLE_ARN')
+            }
+        
+        log_groups = [group.strip() for group in log_groups_str.split(',')]
+        subscriptions = [
+            ensure_subscription_filter(_client('logs'), log_group, filter_name, firehose_arn, subscription_role_arn)
+            for log_group in log_groups
+        ]
+        
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Subscription filters reconciled',
+                'subscriptions': subscriptions
+            })
+        }
     
     if not log_groups_str or not s3_bucket:
         return {
@@ -42,10 +96,13 @@ def lambda_handler(event, context):
     start_time_ms = int(start_time.timestamp() * 1000)
     end_time_ms = int(end_time.timestamp() * 1000)
     
-    logs_client = boto3.client('logs')
+    logs_client = _client('logs', config=EXPORT_CLIENT_CONFIG)
     export_tasks = []
     
-    for log_group in log_groups:
+    # Stop waiting for an export slot shortly before the function times out
+    deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - TIMEOUT_MARGIN_SECONDS
+    
+    def export_log_group(log_group):
         # Create a unique task name
         task_name = f"export-{log_group.replace('/', '-')}-{end_time.strftime('%Y-%m-%d-%H-%M-%S')}"
         
@@ -54,7 +111,9 @@ def lambda_handler(event, context):
         destination = f"{s3_prefix}{log_group}/{date_prefix}/"
         
         try:
-            response = logs_client.create_export_task(
+            response = create_export_task_with_retry(
+                logs_client,
+                deadline,
                 taskName=task_name,
                 logGroupName=log_group,
                 fromTime=start_time_ms,
@@ -63,17 +122,27 @@ def lambda_handler(event, context):
                 destinationPrefix=destination
             )
             
-            export_tasks.append({
+            return {
                 'logGroup': log_group,
                 'taskId': response['taskId'],
                 'destination': f"s3://{s3_bucket}/{destination}"
-            })
+            }
             
         except Exception as e:
-            export_tasks.append({
+            return {
                 'logGroup': log_group,
                 'error': str(e)
-            })
+            }
+    
+    # Submit all log groups at once; workers queue behind the per-account export task limit
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(export_log_group, log_group) for log_group in log_groups]
+        
+        for future in as_completed(futures):
+            export_task = future.result()
+            if 'taskId' in export_task:
+                print(f"Created export task {export_task['taskId']} for {export_task['logGroup']}")
+            export_tasks.append(export_task)
     
     return {
         'statusCode': 200,
@@ -85,4 +154,42 @@ def lambda_handler(event, context):
             },
             'exportTasks': export_tasks
         })
-    }
\ No newline at end of file
+    }
+
+def create_export_task_with_retry(logs_client, deadline, **kwargs):
+    """Create an export task, backing off while another export task holds the account slot"""
+    delay = 1
+    while True:
+        try:
+            return logs_client.create_export_task(**kwargs)
+        except logs_client.exceptions.LimitExceededException:
+            if time.monotonic() + delay > deadline:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+def ensure_subscription_filter(logs_client, log_group, filter_name, destination_arn, role_arn):
+    """Create or update the log group's subscription filter to stream to Firehose"""
+    try:
+        existing = logs_client.describe_subscription_filters(
+            logGroupName=log_group,
+            filterNamePrefix=filter_name
+        )['subscriptionFilters']
+        
+        current = next((f for f in existing if f['filterName'] == filter_name), None)
+        if current and current.get('destinationArn') == destination_arn and \
+                current.get('roleArn') == role_arn and current.get('filterPattern') == '':
+            return {'logGroup': log_group, 'status': 'unchanged'}
+        
+        logs_client.put_subscription_filter(
+            logGroupName=log_group,
+            filterName=filter_name,
+            filterPattern='',
+            destinationArn=destination_arn,
+            roleArn=role_arn
+        )
+        
+        return {'logGroup': log_group, 'status': 'updated' if current else 'created'}
+    
+    except Exception as e:
+        return {'logGroup': log_group, 'error': str(e)}
@@ -1,8 +1,19 @@
 import boto3
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region)
+    return _clients[key]
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to manage RDS snapshots.
@@ -30,29 +41,33 @@ def lambda_handler(event, context):
     
     db_instances = [instance.strip() for instance in db_instances_str.split(',')]
     
-    rds = boto3.client('rds', region_name=region)
+    rds = _client('rds', region)
     created_snapshots = []
     deleted_snapshots = []
     
+    # Capture the current time once for snapshot names, tags and the cutoff
+    now = datetime.now()
+    timestamp = now.strftime('%Y-%m-%d-%H-%M')
+    snapshot_tags = [
+        {
+            'Key': 'CreatedBy',
+            'Value': 'LambdaSnapshotManager'
+        },
+        {
+            'Key': 'CreationDate',
+            'Value': now.strftime('%Y-%m-%d')
+        }
+    ]
+    
     # Create new snapshots
     for db_instance in db_instances:
-        timestamp = datetime.now().strftime('%Y-%m-%d-%H-%M')
         snapshot_id = f"{snapshot_prefix}-{db_instance}-{timestamp}"
         
         try:
             rds.create_db_snapshot(
                 DBSnapshotIdentifier=snapshot_id,
                 DBInstanceIdentifier=db_instance,
-                Tags=[
-                    {
-                        'Key': 'CreatedBy',
-                        'Value': 'LambdaSnapshotManager'
-                    },
-                    {
-                        'Key': 'CreationDate',
-                        'Value': datetime.now().strftime('%Y-%m-%d')
-                    }
-                ]
+                Tags=snapshot_tags
             )
             created_snapshots.append({
                 'DBInstance': db_instance,
@@ -65,34 +80,41 @@ def lambda_handler(event, context):
             })
     
     # Delete old snapshots
-    cutoff_date = datetime.now() - timedelta(days=retention_days)
+    cutoff_date = now - timedelta(days=retention_days)
     
-    # Get all automated snapshots with our prefix
-    response = rds.describe_db_snapshots(
-        SnapshotType='manual',
-        IncludeShared=False,
-        IncludePublic=False
-    )
+    # Get all manual snapshots with our prefix (RDS has no server-side prefix filter)
+    paginator = rds.get_paginator('describe_db_snapshots')
+    expired_snapshot_ids = []
     
-    for snapshot in response['DBSnapshots']:
-        snapshot_id = snapshot['DBSnapshotIdentifier']
-        
-        # Check if this is one of our managed snapshots
-        if snapshot_id.startswith(snapshot_prefix):
-            snapshot_create_time = snapshot['SnapshotCreateTime']
+    for page in paginator.paginate(SnapshotType='manual', IncludeShared=False, IncludePublic=False):
+        for snapshot in page['DBSnapshots']:
+            snapshot_id = snapshot['DBSnapshotIdentifier']
+            
+            # Check if this is one of our managed snapshots
+            if not snapshot_id.startswith(snapshot_prefix):
+                continue
+            
+            # Snapshots still being created have no creation time yet
+            snapshot_create_time = snapshot.get('SnapshotCreateTime')
             
             # Delete if older than retention period
-            if snapshot_create_time.replace(tzinfo=None) < cutoff_date:
-                try:
-                    rds.delete_db_snapshot(
-                        DBSnapshotIdentifier=snapshot_id
-                    )
-                    deleted_snapshots.append(snapshot_id)
-                except Exception as e:
-                    deleted_snapshots.append({
-                        'SnapshotId': snapshot_id,
-                        'Error': str(e)
-                    })
+            if snapshot_create_time and snapshot_create_time.replace(tzinfo=None) < cutoff_date:
+                expired_snapshot_ids.append(snapshot_id)
+    
+    def delete_snapshot(snapshot_id):
+        try:
+            rds.delete_db_snapshot(
+                DBSnapshotIdentifier=snapshot_id
+            )
+            return snapshot_id
+        except Exception as e:
+            return {
+                'SnapshotId': snapshot_id,
+                'Error': str(e)
+            }
+    
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        deleted_snapshots.extend(executor.map(delete_snapshot, expired_snapshot_ids))
     
     return {
         'statusCode': 200,
@@ -1,8 +1,20 @@
+import bisect
 import boto3
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region)
+    return _clients[key]
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to audit security groups for risky configurations.
@@ -17,11 +29,16 @@ def lambda_handler(event, context):
     - REGIONS: Comma-separated list of AWS regions to scan (default: current region)
     - SNS_TOPIC_ARN: Optional SNS topic ARN for notifications
     - HIGH_RISK_PORTS: Comma-separated list of high-risk ports (default: 22,3389,1433,3306,5432)
+    - REPORT_BUCKET: Optional S3 bucket to write findings to as NDJSON, one file per region;
+      notifications and the response then carry issue counts and the report location only
+    - REPORT_PREFIX: Prefix for report objects (default: 'security-group-audit/')
     """
     # Get configuration from environment variables
     regions_str = os.environ.get('REGIONS', '')
     sns_topic_arn = os.environ.get('SNS_TOPIC_ARN', '')
     high_risk_ports_str = os.environ.get('HIGH_RISK_PORTS', '22,3389,1433,3306,5432')
+    report_bucket = os.environ.get('REPORT_BUCKET', '')
+    report_prefix = os.environ.get('REPORT_PREFIX', 'security-group-audit/')
     
     # If no regions specified, use the current region
     if not regions_str:
@@ -29,93 +46,62 @@ def lambda_handler(event, context):
     else:
         regions = [region.strip() for region in regions_str.split(',')]
     
-    high_risk_ports = [int(port.strip()) for port in high_risk_ports_str.split(',')]
+    # Sorted so a rule's port range can be checked with a single bisect
+    high_risk_ports = sorted(int(port.strip()) for port in high_risk_ports_str.split(','))
     
-    findings = {}
+    # Create clients up front since boto3 client creation is not thread-safe
+    ec2_clients = {region: _client('ec2', region) for region in regions}
+    s3 = _client('s3') if report_bucket else None
     
-    for region in regions:
-        ec2 = boto3.client('ec2', region_name=region)
-        findings[region] = {
-            'open_to_world': [],
-            'high_risk_ports': [],
-            'unused_groups': []
-        }
-        
-        # Get all security groups
-        security_groups = ec2.describe_security_groups()['SecurityGroups']
-        
-        # Get network interfaces to check for unused security groups
-        network_interfaces = ec2.describe_network_interfaces()
-        used_sg_ids = set()
-        
-        for interface in network_interfaces['NetworkInterfaces']:
-            for sg in interface['Groups']:
-                used_sg_ids.add(sg['GroupId'])
+    now = datetime.now()
+    report_key_prefix = f"{report_prefix}{now.strftime('%Y/%m/%d/%H%M%S')}/"
+    
+    def audit(region):
+        region_findings = audit_region(ec2_clients[region], high_risk_ports)
+        if not report_bucket:
+            return region_findings
         
-        # Analyze each security group
-        for sg in security_groups:
-            sg_id = sg['GroupId']
-            sg_name = sg['GroupName']
-            
-            # Check if security group is unused
-            if sg_id not in used_sg_ids and sg_name != 'default':
-                findings[region]['unused_groups'].append({
-                    'id': sg_id,
-                    'name': sg_name,
-                    'vpc_id': sg.get('VpcId', 'N/A')
-                })
-            
-            # Check inbound rules
-            for rule in sg.get('IpPermissions', []):
-                from_port = rule.get('FromPort', 0)
-                to_port = rule.get('ToPort', 0)
-                ip_ranges = rule.get('IpRanges', [])
-                
-                for ip_range in ip_ranges:
-                    cidr = ip_range.get('CidrIp', '')
-                    
-                    # Check for rules open to the world
-                    if cidr == '0.0.0.0/0':
-                        findings[region]['open_to_world'].append({
-                            'id': sg_id,
-                            'name': sg_name,
-                            'from_port': from_port,
-                            'to_port': to_port,
-                            'protocol': rule.get('IpProtocol', 'all')
-                        })
-                        
-                        # Check for high-risk ports
-                        if any(from_port <= port <= to_port for port in high_risk_ports):
-                            findings[region]['high_risk_ports'].append({
-                                'id': sg_id,
-                                'name': sg_name,
-                                'from_port': from_port,
-                                'to_port': to_port,
-                                'protocol': rule.get('IpProtocol', 'all'),
-                                'cidr': cidr
-                            })
+        # Hand the findings off to S3 so only their counts stay in memory
+        write_ndjson_report(s3, report_bucket, f"{report_key_prefix}{region}.ndjson", region_findings)
+        return {finding_type: len(items) for finding_type, items in region_findings.items()}
+    
+    # Regions are independent, so audit them concurrently
+    with ThreadPoolExecutor(max_workers=min(16, len(regions))) as executor:
+        findings = dict(zip(regions, executor.map(audit, regions)))
+    
+    if report_bucket:
+        issue_counts = findings
+        report = {
+            'report': f"s3://{report_bucket}/{report_key_prefix}",
+            'issue_counts': issue_counts
+        }
+    else:
+        issue_counts = {
+            region: {finding_type: len(items) for finding_type, items in region_findings.items()}
+            for region, region_findings in findings.items()
+        }
+        report = {'findings': findings}
     
     # Send findings to SNS if configured
     if sns_topic_arn:
-        sns = boto3.client('sns')
+        sns = _client('sns')
         
         # Count total issues
         total_issues = sum(
-            len(findings[region]['open_to_world']) + 
-            len(findings[region]['high_risk_ports']) + 
-            len(findings[region]['unused_groups'])
-            for region in findings
+            count
+            for region_counts in issue_counts.values()
+            for count in region_counts.values()
         )
         
         message = {
             'subject': f"Security Group Audit - {total_issues} issues found",
-            'timestamp': datetime.now().isoformat(),
-            'findings': findings
+            'timestamp': now.isoformat(),
+            **report
         }
         
         sns.publish(
             TopicArn=sns_topic_arn,
-            Message=json.dumps(message, indent=2),
+            Message=json.dumps(message, separators=(',', ':'), default=str),
             Subject=message['subject']
         )
     
@@ -123,6 +109,95 @@ def lambda_handler(event, context):
         'statusCode': 200,
         'body': json.dumps({
             'message': 'Security group audit completed',
-            'findings': findings
-        })
-    }
\ No newline at end of file
+            **report
+        }, separators=(',', ':'), default=str)
+    }
+
+def audit_region(ec2, high_risk_ports):
+    """Audit the security groups of a single region and return its findings"""
+    findings = {
+        'open_to_world': [],
+        'high_risk_ports': [],
+        'unused_groups': []
+    }
+    
+    # Get network interfaces to check for unused security groups
+    ni_paginator = ec2.get_paginator('describe_network_interfaces')
+    used_sg_ids = {
+        sg['GroupId']
+        for page in ni_paginator.paginate()
+        for interface in page['NetworkInterfaces']
+        for sg in interface['Groups']
+    }
+    
+    # Stream security groups page by page and analyze each one
+    sg_paginator = ec2.get_paginator('describe_security_groups')
+    security_groups = (
+        sg
+        for page in sg_paginator.paginate()
+        for sg in page['SecurityGroups']
+    )
+    
+    for sg in security_groups:
+        sg_id = sg['GroupId']
+        sg_name = sg['GroupName']
+        
+        # Check if security group is unused
+        if sg_id not in used_sg_ids and sg_name != 'default':
+            findings['unused_groups'].append({
+                'id': sg_id,
+                'name': sg_name,
+                'vpc_id': sg.get('VpcId', 'N/A')
+            })
+        
+        # Check inbound rules
+        for rule in sg.get('IpPermissions', []):
+            from_port = rule.get('FromPort', 0)
+            to_port = rule.get('ToPort', 0)
+            ip_ranges = rule.get('IpRanges', [])
+            
+            for ip_range in ip_ranges:
+                cidr = ip_range.get('CidrIp', '')
+                
+                # Check for rules open to the world
+                if cidr == '0.0.0.0/0':
+                    findings['open_to_world'].append({
+                        'id': sg_id,
+                        'name': sg_name,
+                        'from_port': from_port,
+                        'to_port': to_port,
+                        'protocol': rule.get('IpProtocol', 'all')
+                    })
+                    
+                    # Check for high-risk ports
+                    if ports_overlap(high_risk_ports, from_port, to_port):
+                        findings['high_risk_ports'].append({
+                            'id': sg_id,
+                            'name': sg_name,
+                            'from_port': from_port,
+                            'to_port': to_port,
+                            'protocol': rule.get('IpProtocol', 'all'),
+                            'cidr': cidr
+                        })
+    
+    return findings
+
+def ports_overlap(sorted_ports, from_port, to_port):
+    """Return True if any port in the sorted list falls within [from_port, to_port]"""
+    idx = bisect.bisect_left(sorted_ports, from_port)
+    return idx < len(sorted_ports) and sorted_ports[idx] <= to_port
+
+def write_ndjson_report(s3, bucket, key, findings):
+    """Write findings to S3 as newline-delimited JSON, one finding per line"""
+    lines = (
+        json.dumps({'type': finding_type, **item}, separators=(',', ':'), default=str).encode() + b'\n'
+        for finding_type, items in findings.items()
+        for item in items
+    )
+    
+    s3.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=b''.join(lines),
+        ContentType='application/x-ndjson'
+    )
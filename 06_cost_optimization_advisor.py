@@ -1,8 +1,22 @@
 import boto3
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region)
+    return _clients[key]
+
+# Maximum number of metric queries accepted by a single GetMetricData request
+MAX_METRIC_QUERIES_PER_CALL = 500
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to identify cost optimization opportunities.
@@ -18,16 +32,23 @@ def lambda_handler(event, context):
     - CPU_THRESHOLD: CPU utilization threshold for underutilized instances (default: 10)
     - DAYS_TO_ANALYZE: Number of days of metrics to analyze (default: 14)
     - SNS_TOPIC_ARN: Optional SNS topic ARN for notifications
+    - MAX_WORKERS: Maximum number of concurrent CloudWatch requests (default: 32)
+    - REPORT_BUCKET: Optional S3 bucket to write recommendations to as NDJSON; notifications
+      and the response then carry recommendation counts and the report location only
+    - REPORT_PREFIX: Prefix for report objects (default: 'cost-optimization/')
     """
     # Get configuration from environment variables
     region = os.environ.get('REGION', boto3.session.Session().region_name)
     cpu_threshold = float(os.environ.get('CPU_THRESHOLD', 10))
     days_to_analyze = int(os.environ.get('DAYS_TO_ANALYZE', 14))
     sns_topic_arn = os.environ.get('SNS_TOPIC_ARN', '')
+    max_workers = int(os.environ.get('MAX_WORKERS', 32))
+    report_bucket = os.environ.get('REPORT_BUCKET', '')
+    report_prefix = os.environ.get('REPORT_PREFIX', 'cost-optimization/')
     
-    ec2 = boto3.client('ec2', region_name=region)
-    cloudwatch = boto3.client('cloudwatch', region_name=region)
-    elb = boto3.client('elbv2', region_name=region)
+    ec2 = _client('ec2', region)
+    cloudwatch = _client('cloudwatch', region)
+    elb = _client('elbv2', region)
     
     recommendations = {
         'underutilized_instances': [],
@@ -44,32 +65,32 @@ def lambda_handler(event, context):
     end_time = datetime.now()
     start_time = end_time - timedelta(days=days_to_analyze)
     
-    for reservation in instances['Reservations']:
-        for instance in reservation['Instances']:
-            instance_id = instance['InstanceId']
-            instance_type = instance['InstanceType']
-            
-            # Get average CPU utilization
-            response = cloudwatch.get_metric_statistics(
-                Namespace='AWS/EC2',
-                MetricName='CPUUtilization',
-                Dimensions=[{'Name': 'InstanceId', 'Value': instance_id}],
-                StartTime=start_time,
-                EndTime=end_time,
-                Period=86400,  # Daily average
-                Statistics=['Average']
-            )
-            
-            if response['Datapoints']:
-                avg_cpu = sum(point['Average'] for point in response['Datapoints']) / len(response['Datapoints'])
-                
-                if avg_cpu < cpu_threshold:
-                    recommendations['underutilized_instances'].append({
-                        'instance_id': instance_id,
-                        'instance_type': instance_type,
-                        'avg_cpu_utilization': avg_cpu,
-                        'days_analyzed': days_to_analyze
-                    })
+    running_instances = [
+        instance
+        for reservation in instances['Reservations']
+        for instance in reservation['Instances']
+    ]
+    
+    # Fetch daily CPU averages for all instances in batched GetMetricData requests
+    cpu_values = get_metric_values(cloudwatch, [
+        build_metric_query(
+            f"cpu{i}", 'AWS/EC2', 'CPUUtilization',
+            [{'Name': 'InstanceId', 'Value': instance['InstanceId']}], 'Average'
+        )
+        for i, instance in enumerate(running_instances)
+    ], start_time, end_time, max_workers)
+    
+    for i, instance in enumerate(running_instances):
+        values = cpu_values.get(f"cpu{i}")
+        avg_cpu = sum(values) / len(values) if values else None
+        
+        if avg_cpu is not None and avg_cpu < cpu_threshold:
+            recommendations['underutilized_instances'].append({
+                'instance_id': instance['InstanceId'],
+                'instance_type': instance['InstanceType'],
+                'avg_cpu_utilization': avg_cpu,
+                'days_analyzed': days_to_analyze
+            })
     
     # Find unattached EBS volumes
     volumes = ec2.describe_volumes()
@@ -86,25 +107,21 @@ def lambda_handler(event, context):
     # Find idle load balancers
     load_balancers = elb.describe_load_balancers()
     
-    for lb in load_balancers['LoadBalancers']:
-        lb_arn = lb['LoadBalancerArn']
-        lb_name = lb['LoadBalancerName']
-        
-        # Get request count
-        response = cloudwatch.get_metric_statistics(
-            Namespace='AWS/ApplicationELB',
-            MetricName='RequestCount',
-            Dimensions=[{'Name': 'LoadBalancer', 'Value': lb_arn.split('/')[-1]}],
-            StartTime=start_time,
-            EndTime=end_time,
-            Period=86400,  # Daily
-            Statistics=['Sum']
+    request_values = get_metric_values(cloudwatch, [
+        build_metric_query(
+            f"requests{i}", 'AWS/ApplicationELB', 'RequestCount',
+            [{'Name': 'LoadBalancer', 'Value': lb['LoadBalancerArn'].split('/')[-1]}], 'Sum'
         )
+        for i, lb in enumerate(load_balancers['LoadBalancers'])
+    ], start_time, end_time, max_workers)
+    
+    for i, lb in enumerate(load_balancers['LoadBalancers']):
+        request_counts = request_values.get(f"requests{i}")
         
-        if not response['Datapoints'] or all(point['Sum'] < 10 for point in response['Datapoints']):
+        if not request_counts or all(count < 10 for count in request_counts):
             recommendations['idle_load_balancers'].append({
-                'load_balancer_name': lb_name,
-                'load_balancer_arn': lb_arn,
+                'load_balancer_name': lb['LoadBalancerName'],
+                'load_balancer_arn': lb['LoadBalancerArn'],
                 'days_analyzed': days_to_analyze
             })
     
@@ -123,20 +140,31 @@ def lambda_handler(event, context):
         'estimated_monthly_savings': 0
     }
     
+    if report_bucket:
+        # Keep large result sets out of the SNS message and the Lambda response
+        report_key = f"{report_prefix}{datetime.now().strftime('%Y/%m/%d/%H%M%S')}.ndjson"
+        write_ndjson_report(_client('s3'), report_bucket, report_key, recommendations)
+        report = {
+            'report': f"s3://{report_bucket}/{report_key}",
+            'recommendation_counts': {category: len(items) for category, items in recommendations.items()}
+        }
+    else:
+        report = {'recommendations': recommendations}
+    
     # Send to SNS if configured
     if sns_topic_arn:
-        sns = boto3.client('sns')
+        sns = _client('sns')
         
         message = {
             'subject': "AWS Cost Optimization Recommendations",
             'timestamp': datetime.now().isoformat(),
-            'recommendations': recommendations,
+            **report,
             'potential_savings': savings
         }
         
         sns.publish(
             TopicArn=sns_topic_arn,
-            Message=json.dumps(message, indent=2),
+            Message=json.dumps(message, separators=(',', ':'), default=str),
             Subject=message['subject']
         )
     
@@ -144,7 +172,64 @@ def lambda_handler(event, context):
         'statusCode': 200,
         'body': json.dumps({
             'message': 'Cost optimization analysis completed',
-            'recommendations': recommendations,
+            **report,
             'potential_savings': savings
-        })
-    }
\ No newline at end of file
+        }, separators=(',', ':'), default=str)
+    }
+
+def build_metric_query(query_id, namespace, metric_name, dimensions, stat):
+    """Build a daily GetMetricData query for a single metric"""
+    return {
+        'Id': query_id,
+        'MetricStat': {
+            'Metric': {
+                'Namespace': namespace,
+                'MetricName': metric_name,
+                'Dimensions': dimensions
+            },
+            'Period': 86400,  # Daily
+            'Stat': stat
+        },
+        'ReturnData': True
+    }
+
+def get_metric_values(cloudwatch, queries, start_time, end_time, max_workers):
+    """Run metric queries in GetMetricData batches and return the values keyed by query ID"""
+    batches = [
+        queries[i:i + MAX_METRIC_QUERIES_PER_CALL]
+        for i in range(0, len(queries), MAX_METRIC_QUERIES_PER_CALL)
+    ]
+    
+    def fetch_batch(batch):
+        values = {}
+        paginator = cloudwatch.get_paginator('get_metric_data')
+        for page in paginator.paginate(MetricDataQueries=batch, StartTime=start_time, EndTime=end_time):
+            for result in page['MetricDataResults']:
+                values.setdefault(result['Id'], []).extend(result['Values'])
+        return values
+    
+    metric_values = {}
+    if not batches:
+        return metric_values
+    
+    # Batches are independent, so overlap them across a thread pool
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for values in executor.map(fetch_batch, batches):
+            metric_values.update(values)
+    
+    return metric_values
+
+def write_ndjson_report(s3, bucket, key, findings):
+    """Write findings to S3 as newline-delimited JSON, one finding per line"""
+    lines = (
+        json.dumps({'type': finding_type, **item}, separators=(',', ':'), default=str).encode() + b'\n'
+        for finding_type, items in findings.items()
+        for item in items
+    )
+    
+    s3.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=b''.join(lines),
+        ContentType='application/x-ndjson'
+    )
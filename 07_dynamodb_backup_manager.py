@@ -1,7 +1,18 @@
 import boto3
 import json
 import os
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region)
+    return _clients[key]
 
 def lambda_handler(event, context):
     """
@@ -22,7 +33,7 @@ def lambda_handler(event, context):
     retention_days = int(os.environ.get('BACKUP_RETENTION_DAYS', '30'))
     backup_prefix = os.environ.get('BACKUP_PREFIX', 'automated')
     
-    dynamodb = boto3.client('dynamodb', region_name=region)
+    dynamodb = _client('dynamodb', region)
     
     # Get list of tables to backup
     tables_to_backup = []
@@ -33,17 +44,20 @@ def lambda_handler(event, context):
         for page in paginator.paginate():
             tables_to_backup.extend(page['TableNames'])
     
+    # Capture the current time once for backup names and the cutoff
+    now = datetime.now(timezone.utc)
+    timestamp = now.strftime('%Y-%m-%d-%H-%M')
+    
     # Calculate cutoff date for backup deletion
-    cutoff_date = datetime.now() - timedelta(days=retention_days)
+    cutoff_date = now - timedelta(days=retention_days)
     
     created_backups = []
     deleted_backups = []
     errors = []
     
     # Create new backups
-    for table_name in tables_to_backup:
+    def create_backup(table_name):
         try:
-            timestamp = datetime.now().strftime('%Y-%m-%d-%H-%M')
             backup_name = f"{backup_prefix}-{table_name}-{timestamp}"
             
             response = dynamodb.create_backup(
@@ -51,49 +65,63 @@ def lambda_handler(event, context):
                 BackupName=backup_name
             )
             
-            created_backups.append({
+            return {
                 'table_name': table_name,
                 'backup_name': backup_name,
                 'backup_arn': response['BackupDetails']['BackupArn']
-            })
+            }, None
             
         except Exception as e:
-            errors.append({
+            return None, {
                 'table_name': table_name,
                 'operation': 'create_backup',
                 'error': str(e)
-            })
+            }
+    
+    # Backups of different tables are independent, so request them concurrently
+    with ThreadPoolExecutor(max_workers=25) as executor:
+        for created, error in executor.map(create_backup, tables_to_backup):
+            if created:
+                created_backups.append(created)
+            else:
+                errors.append(error)
     
     # Delete old backups
     try:
         paginator = dynamodb.get_paginator('list_backups')
+        expired_backups = []
         
-        for page in paginator.paginate():
+        # Only user backups created before the cutoff are returned
+        for page in paginator.paginate(BackupType='USER', TimeRangeUpperBound=cutoff_date):
             for backup in page['BackupSummaries']:
                 # Only delete backups created by this automation
                 if backup['BackupName'].startswith(backup_prefix):
-                    backup_creation = backup['BackupCreationDateTime']
-                    
-                    # Convert to datetime object if it's not already
-                    if not isinstance(backup_creation, datetime):
-                        backup_creation = datetime.fromtimestamp(backup_creation)
-                    
-                    if backup_creation < cutoff_date:
-                        try:
-                            dynamodb.delete_backup(
-                                BackupArn=backup['BackupArn']
-                            )
-                            deleted_backups.append({
-                                'backup_name': backup['BackupName'],
-                                'backup_arn': backup['BackupArn'],
-                                'creation_date': backup_creation.isoformat()
-                            })
-                        except Exception as e:
-                            errors.append({
-                                'backup_name': backup['BackupName'],
-                                'operation': 'delete_backup',
-                                'error': str(e)
-                            })
+                    expired_backups.append(backup)
+        
+        def delete_backup(backup):
+            try:
+                dynamodb.delete_backup(
+                    BackupArn=backup['BackupArn']
+                )
+                return {
+                    'backup_name': backup['BackupName'],
+                    'backup_arn': backup['BackupArn'],
+                    'creation_date': backup['BackupCreationDateTime'].isoformat()
+                }, None
+            except Exception as e:
+                return None, {
+                    'backup_name': backup['BackupName'],
+                    'operation': 'delete_backup',
+                    'error': str(e)
+                }
+        
+        # Backups are deleted independently, so issue the calls concurrently
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            for deleted, error in executor.map(delete_backup, expired_backups):
+                if deleted:
+                    deleted_backups.append(deleted)
+                else:
+                    errors.append(error)
     except Exception as e:
         errors.append({
             'operation': 'list_backups',
@@ -1,7 +1,66 @@
 import boto3
 import json
 import os
-from datetime import datetime, timedelta
+import statistics
+import time
+from botocore.config import Config
+from datetime import datetime, timedelta, timezone
+
+# Metric name and statistic fetched for every function, keyed by the name used in query IDs
+FUNCTION_METRICS = {
+    'errors': ('Errors', 'Sum'),
+    'invocations': ('Invocations', 'Sum'),
+    'duration_max': ('Duration', 'Maximum'),
+    'duration_avg': ('Duration', 'Average'),
+    'memory_max': ('MemoryUtilization', 'Maximum'),
+    'memory_avg': ('MemoryUtilization', 'Average')
+}
+
+# Metrics fetched for every function; the rest are only fetched for functions that were invoked
+INVOCATION_METRICS = ('errors', 'invocations')
+
+# Maximum number of metric queries accepted by a single GetMetricData request
+MAX_METRIC_QUERIES_PER_CALL = 500
+
+# Maximum number of log groups a single Logs Insights query can search
+MAX_LOG_GROUPS_PER_QUERY = 50
+
+# Maximum number of seconds to wait for an asynchronous AWS job to finish
+POLL_TIMEOUT_SECONDS = 120
+
+# Shared client configuration: a larger connection pool for concurrent calls,
+# adaptive retries to absorb throttling, and TCP keep-alive on pooled connections
+CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True
+)
+
+# Maximum number of items per category included in an SNS notification
+MAX_NOTIFICATION_ITEMS = 100
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
+
+# Slow-changing listings are cached across warm invocations as (value, fetched_at)
+_cache = {}
+
+def _cached(key, ttl, fetch):
+    """Return the cached value for key if younger than ttl seconds, else fetch and cache it"""
+    value, fetched_at = _cache.get(key, (None, 0))
+    if time.time() - fetched_at < ttl:
+        return value
+    
+    value = fetch()
+    _cache[key] = (value, time.time())
+    return value
 
 def lambda_handler(event, context):
     """
@@ -19,6 +78,8 @@ def lambda_handler(event, context):
     - DURATION_THRESHOLD: Duration threshold percentage of max timeout (default: 80)
     - MEMORY_THRESHOLD: Memory usage threshold percentage (default: 80)
     - SNS_TOPIC_ARN: Optional SNS topic ARN for notifications
+    - CACHE_TTL_SECONDS: How long function and log group listings are reused across
+      warm invocations (default: 300)
     """
     # Get configuration from environment variables
     region = os.environ.get('REGION', 'us-east-1')
@@ -26,20 +87,18 @@ def lambda_handler(event, context):
     duration_threshold = float(os.environ.get('DURATION_THRESHOLD', 80))
     memory_threshold = float(os.environ.get('MEMORY_THRESHOLD', 80))
     sns_topic_arn = os.environ.get('SNS_TOPIC_ARN', '')
+    cache_ttl = int(os.environ.get('CACHE_TTL_SECONDS', 300))
     
     # Initialize AWS clients
-    lambda_client = boto3.client('lambda', region_name=region)
-    cloudwatch = boto3.client('cloudwatch', region_name=region)
-    logs_client = boto3.client('logs', region_name=region)
+    lambda_client = _client('lambda', region)
+    cloudwatch = _client('cloudwatch', region)
+    logs_client = _client('logs', region)
     
     # Get all Lambda functions
-    functions = []
-    paginator = lambda_client.get_paginator('list_functions')
-    for page in paginator.paginate():
-        functions.extend(page['Functions'])
+    functions = _cached(('functions', region), cache_ttl, lambda: list_functions(lambda_client))
     
     # Calculate time range for metrics (last 24 hours)
-    end_time = datetime.now()
+    end_time = datetime.now(timezone.utc)
     start_time = end_time - timedelta(hours=24)
     
     issues = {
@@ -49,164 +108,262 @@ def lambda_handler(event, context):
         'high_memory_usage': []
     }
     
-    for function in functions:
-        function_name = function['FunctionName']
-        function_timeout = function['Timeout']
-        function_memory = function['MemorySize']
-        
-        # Check for errors
-        error_metric = cloudwatch.get_metric_statistics(
-            Namespace='AWS/Lambda',
-            MetricName='Errors',
-            Dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-            StartTime=start_time,
-            EndTime=end_time,
-            Period=3600,  # 1 hour
-            Statistics=['Sum']
+    # Fetch the invocation metrics of all functions in batched GetMetricData requests
+    function_metrics = get_function_metrics(
+        cloudwatch, [function['FunctionName'] for function in functions],
+        INVOCATION_METRICS, start_time, end_time
+    )
+    
+    # Idle functions have no errors, durations, memory usage or timeouts to check
+    active = [
+        (function, metrics)
+        for function, metrics in zip(functions, function_metrics)
+        if sum(metrics['invocations']) > 0
+    ]
+    active_function_names = [function['FunctionName'] for function, _ in active]
+    
+    performance_metrics = get_function_metrics(
+        cloudwatch, active_function_names,
+        [key for key in FUNCTION_METRICS if key not in INVOCATION_METRICS], start_time, end_time
+    )
+    for (_, metrics), extra_metrics in zip(active, performance_metrics):
+        metrics.update(extra_metrics)
+    
+    # Look for timeouts in the logs of all functions with batched Logs Insights queries
+    try:
+        existing_log_groups = _cached(
+            ('log_groups', region), cache_ttl, lambda: list_lambda_log_groups(logs_client)
         )
-        
-        invocation_metric = cloudwatch.get_metric_statistics(
-            Namespace='AWS/Lambda',
-            MetricName='Invocations',
-            Dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-            StartTime=start_time,
-            EndTime=end_time,
-            Period=3600,  # 1 hour
-            Statistics=['Sum']
+        timeout_counts = get_timeout_counts(
+            logs_client, active_function_names, existing_log_groups, start_time, end_time
         )
-        
-        # Calculate error rate
-        total_errors = sum(point['Sum'] for point in error_metric['Datapoints'])
-        total_invocations = sum(point['Sum'] for point in invocation_metric['Datapoints'])
-        
-        if total_invocations > 0:
-            error_rate = (total_errors / total_invocations) * 100
-            if error_rate > error_threshold:
-                issues['high_error_rate'].append({
-                    'function_name': function_name,
-                    'error_rate': error_rate,
-                    'total_errors': total_errors,
-                    'total_invocations': total_invocations
-                })
-        
-        # Check for timeouts by looking at CloudWatch Logs
+    except Exception as e:
+        # Log the error but continue with the metric checks
+        print(f"Error checking timeouts: {str(e)}")
+        timeout_counts = {}
+    
+    for function, metrics in active:
         try:
-            log_group_name = f"/aws/lambda/{function_name}"
-            
-            # Check if log group exists
-            try:
-                logs_client.describe_log_groups(logGroupNamePrefix=log_group_name)
-                
-                # Search for timeout messages in the logs
-                query = "filter @message like /Task timed out/ | stats count() as timeout_count"
-                start_query_response = logs_client.start_query(
-                    logGroupName=log_group_name,
-                    startTime=int(start_time.timestamp()),
-                    endTime=int(end_time.timestamp()),
-                    queryString=query
-                )
-                
-                query_id = start_query_response['queryId']
-                
-                # Wait for query to complete
-                response = None
-                while response is None or response['status'] == 'Running':
-                    response = logs_client.get_query_results(queryId=query_id)
-                    if response['status'] == 'Running':
-                        import time
-                        time.sleep(1)
-                
-                # Process results
-                if response['results'] and len(response['results']) > 0:
-                    for result in response['results']:
-                        for field in result:
-                            if field['field'] == 'timeout_count' and int(field['value']) > 0:
-                                issues['timeout_issues'].append({
-                                    'function_name': function_name,
-                                    'timeout_count': int(field['value'])
-                                })
-            except logs_client.exceptions.ResourceNotFoundException:
-                # Log group doesn't exist, skip
-                pass
-                
+            function_issues = analyze_function(
+                function, metrics, timeout_counts.get(function['FunctionName'], 0),
+                error_threshold, duration_threshold, memory_threshold
+            )
         except Exception as e:
-            # Log the error but continue processing
-            print(f"Error checking timeouts for {function_name}: {str(e)}")
-        
-        # Check for high duration
-        duration_metric = cloudwatch.get_metric_statistics(
-            Namespace='AWS/Lambda',
-            MetricName='Duration',
-            Dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-            StartTime=start_time,
-            EndTime=end_time,
-            Period=3600,  # 1 hour
-            Statistics=['Maximum', 'Average']
-        )
+            # Log the error but keep analyzing the other functions
+            print(f"Error analyzing {function['FunctionName']}: {str(e)}")
+            continue
         
-        if duration_metric['Datapoints']:
-            max_duration = max(point['Maximum'] for point in duration_metric['Datapoints'])
-            avg_duration = sum(point['Average'] for point in duration_metric['Datapoints']) / len(duration_metric['Datapoints'])
-            
-            # Convert to percentage of timeout
-            max_duration_percent = (max_duration / (function_timeout * 1000)) * 100
-            
-            if max_duration_percent > duration_threshold:
-                issues['high_duration'].append({
-                    'function_name': function_name,
-                    'max_duration_ms': max_duration,
-                    'avg_duration_ms': avg_duration,
-                    'timeout_ms': function_timeout * 1000,
-                    'max_duration_percent': max_duration_percent
-                })
-        
-        # Check for high memory usage
-        memory_metric = cloudwatch.get_metric_statistics(
-            Namespace='AWS/Lambda',
-            MetricName='MemoryUtilization',
-            Dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-            StartTime=start_time,
-            EndTime=end_time,
-            Period=3600,  # 1 hour
-            Statistics=['Maximum', 'Average']
-        )
-        
-        if memory_metric['Datapoints']:
-            max_memory_percent = max(point['Maximum'] for point in memory_metric['Datapoints'])
-            avg_memory_percent = sum(point['Average'] for point in memory_metric['Datapoints']) / len(memory_metric['Datapoints'])
-            
-            if max_memory_percent > memory_threshold:
-                issues['high_memory_usage'].append({
-                    'function_name': function_name,
-                    'max_memory_percent': max_memory_percent,
-                    'avg_memory_percent': avg_memory_percent,
-                    'allocated_memory_mb': function_memory
-                })
+        for category, items in function_issues.items():
+            issues[category].extend(items)
+    
+    # Encode the report once and reuse it for the notification and the response
+    report = {
+        'message': 'Lambda function monitoring completed',
+        'issues': issues
+    }
+    body = json.dumps(report, separators=(',', ':'), default=str)
     
     # Send to SNS if configured
     if sns_topic_arn:
-        sns = boto3.client('sns')
+        sns = _client('sns')
         
         # Count total issues
         total_issues = sum(len(issues[category]) for category in issues)
         
         if total_issues > 0:
-            message = {
-                'subject': f"Lambda Function Monitor - {total_issues} issues found",
-                'timestamp': datetime.now().isoformat(),
-                'issues': issues
-            }
+            # Keep the notification well under the 256 KB SNS message limit
+            capped, truncated = cap_categories(issues)
+            message = body
+            if truncated:
+                message = json.dumps({**report, 'issues': capped, 'truncated': truncated},
+                                     separators=(',', ':'), default=str)
             
             sns.publish(
                 TopicArn=sns_topic_arn,
-                Message=json.dumps(message, indent=2),
-                Subject=message['subject']
+                Message=message,
+                Subject=f"Lambda Function Monitor - {total_issues} issues found"
             )
     
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'message': 'Lambda function monitoring completed',
-            'issues': issues
+        'body': body
+    }
+
+def analyze_function(function, metrics, timeout_count,
+                     error_threshold, duration_threshold, memory_threshold):
+    """Check a single Lambda function's metrics and timeouts and return the issues found"""
+    issues = {
+        'high_error_rate': [],
+        'timeout_issues': [],
+        'high_duration': [],
+        'high_memory_usage': []
+    }
+    
+    function_name = function['FunctionName']
+    function_timeout = function['Timeout']
+    function_memory = function['MemorySize']
+    
+    # Calculate error rate
+    total_errors = sum(metrics['errors'])
+    total_invocations = sum(metrics['invocations'])
+    
+    if total_invocations > 0:
+        error_rate = (total_errors / total_invocations) * 100
+        if error_rate > error_threshold:
+            issues['high_error_rate'].append({
+                'function_name': function_name,
+                'error_rate': error_rate,
+                'total_errors': total_errors,
+                'total_invocations': total_invocations
+            })
+    
+    # Check for timeouts found in CloudWatch Logs
+    if timeout_count > 0:
+        issues['timeout_issues'].append({
+            'function_name': function_name,
+            'timeout_count': timeout_count
         })
-    }
\ No newline at end of file
+    
+    # Check for high duration
+    if metrics['duration_max']:
+        max_duration = max(metrics['duration_max'])
+        avg_duration = statistics.fmean(metrics['duration_avg'])
+        
+        # Convert to percentage of timeout
+        max_duration_percent = (max_duration / (function_timeout * 1000)) * 100
+        
+        if max_duration_percent > duration_threshold:
+            issues['high_duration'].append({
+                'function_name': function_name,
+                'max_duration_ms': max_duration,
+                'avg_duration_ms': avg_duration,
+                'timeout_ms': function_timeout * 1000,
+                'max_duration_percent': max_duration_percent
+            })
+    
+    # Check for high memory usage
+    if metrics['memory_max']:
+        max_memory_percent = max(metrics['memory_max'])
+        avg_memory_percent = statistics.fmean(metrics['memory_avg'])
+        
+        if max_memory_percent > memory_threshold:
+            issues['high_memory_usage'].append({
+                'function_name': function_name,
+                'max_memory_percent': max_memory_percent,
+                'avg_memory_percent': avg_memory_percent,
+                'allocated_memory_mb': function_memory
+            })
+    
+    return issues
+
+def get_function_metrics(cloudwatch, function_names, metric_keys, start_time, end_time):
+    """Fetch the hourly values of the given FUNCTION_METRICS entries for each function"""
+    queries = [
+        {
+            'Id': f"{key}_{i}",
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': 'AWS/Lambda',
+                    'MetricName': FUNCTION_METRICS[key][0],
+                    'Dimensions': [{'Name': 'FunctionName', 'Value': function_name}]
+                },
+                'Period': 3600,  # 1 hour
+                'Stat': FUNCTION_METRICS[key][1]
+            },
+            'ReturnData': True
+        }
+        for i, function_name in enumerate(function_names)
+        for key in metric_keys
+    ]
+    
+    function_metrics = [{key: [] for key in metric_keys} for _ in function_names]
+    paginator = cloudwatch.get_paginator('get_metric_data')
+    
+    for i in range(0, len(queries), MAX_METRIC_QUERIES_PER_CALL):
+        batch = queries[i:i + MAX_METRIC_QUERIES_PER_CALL]
+        for page in paginator.paginate(MetricDataQueries=batch, StartTime=start_time, EndTime=end_time):
+            for result in page['MetricDataResults']:
+                key, index = result['Id'].rsplit('_', 1)
+                function_metrics[int(index)][key].extend(result['Values'])
+    
+    return function_metrics
+
+def list_functions(lambda_client):
+    """Return all Lambda functions in the region"""
+    functions = []
+    paginator = lambda_client.get_paginator('list_functions')
+    for page in paginator.paginate():
+        functions.extend(page['Functions'])
+    return functions
+
+def list_lambda_log_groups(logs_client):
+    """Return the names of all existing Lambda log groups"""
+    log_groups = set()
+    paginator = logs_client.get_paginator('describe_log_groups')
+    for page in paginator.paginate(logGroupNamePrefix='/aws/lambda/'):
+        log_groups.update(group['logGroupName'] for group in page['logGroups'])
+    return log_groups
+
+def get_timeout_counts(logs_client, function_names, existing_log_groups, start_time, end_time):
+    """Count 'Task timed out' log messages per function using one query per 50 log groups"""
+    log_groups = [
+        f"/aws/lambda/{function_name}"
+        for function_name in function_names
+        if f"/aws/lambda/{function_name}" in existing_log_groups
+    ]
+    
+    # Logs Insights takes the time range in epoch seconds
+    start_seconds = int(start_time.timestamp())
+    end_seconds = int(end_time.timestamp())
+    
+    # Start every query first so they run concurrently on the service side
+    query_ids = [
+        logs_client.start_query(
+            logGroupNames=log_groups[i:i + MAX_LOG_GROUPS_PER_QUERY],
+            startTime=start_seconds,
+            endTime=end_seconds,
+            queryString="filter @message like /Task timed out/ | stats count() as timeout_count by @log"
+        )['queryId']
+        for i in range(0, len(log_groups), MAX_LOG_GROUPS_PER_QUERY)
+    ]
+    
+    timeout_counts = {}
+    for query_id in query_ids:
+        # Wait for query to complete, backing off between polls
+        response = poll(
+            lambda: logs_client.get_query_results(queryId=query_id),
+            lambda response: response['status'] not in ('Scheduled', 'Running')
+        )
+        
+        for result in response['results']:
+            fields = {field['field']: field['value'] for field in result}
+            
+            # @log is reported as "<account-id>:<log-group-name>"
+            log_group_name = fields.get('@log', '').split(':', 1)[-1]
+            function_name = log_group_name[len('/aws/lambda/'):]
+            timeout_counts[function_name] = int(fields.get('timeout_count', 0))
+    
+    return timeout_counts
+
+def poll(fetch, is_done, timeout=POLL_TIMEOUT_SECONDS):
+    """Call fetch until is_done accepts its result, backing off exponentially between calls"""
+    delay = 0.2
+    started = time.monotonic()
+    while True:
+        result = fetch()
+        if is_done(result):
+            return result
+        if time.monotonic() - started > timeout:
+            raise TimeoutError(f"Polling did not finish within {timeout} seconds")
+        time.sleep(delay)
+        delay = min(delay * 2, 4)
+
+def cap_categories(categories, limit=MAX_NOTIFICATION_ITEMS):
+    """Return the categories with each list capped at limit items, plus how many were dropped"""
+    capped = {category: items[:limit] for category, items in categories.items()}
+    truncated = {
+        category: len(items) - limit
+        for category, items in categories.items()
+        if len(items) > limit
+    }
+    return capped, truncated
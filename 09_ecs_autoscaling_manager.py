@@ -1,14 +1,41 @@
 import boto3
 import json
 import os
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# Shared client configuration: a larger connection pool for concurrent calls,
+# adaptive retries to absorb throttling, and TCP keep-alive on pooled connections
+CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True
+)
+
+# Step scaling policy and alarm name suffixes created by earlier versions of this function
+LEGACY_POLICY_SUFFIXES = ('cpu-scale-out', 'cpu-scale-in', 'memory-scale-out', 'memory-scale-in')
+LEGACY_ALARM_SUFFIXES = ('cpu-high', 'cpu-low', 'memory-high', 'memory-low')
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to manage ECS service autoscaling.
     
-    This function configures and adjusts autoscaling for ECS services based on
-    CloudWatch metrics and custom scaling policies.
+    This function configures and adjusts autoscaling for ECS services using
+    target tracking scaling policies on average CPU and memory utilization.
+    Each policy targets the midpoint of the metric's scale-out and scale-in thresholds.
+    Step scaling policies and alarms created by earlier versions are removed once the
+    target tracking policies are in place.
     
     Environment Variables:
     - REGION: AWS region to operate in (default: us-east-1)
@@ -41,232 +68,143 @@ def lambda_handler(event, context):
         }
     
     # Initialize AWS clients
-    ecs = boto3.client('ecs', region_name=region)
-    appautoscaling = boto3.client('application-autoscaling', region_name=region)
-    cloudwatch = boto3.client('cloudwatch', region_name=region)
+    ecs = _client('ecs', region)
+    appautoscaling = _client('application-autoscaling', region)
+    cloudwatch = _client('cloudwatch', region)
+    
+    # Target tracking keeps utilization around a single setpoint
+    cpu_target = (cpu_scale_out + cpu_scale_in) / 2
+    memory_target = (memory_scale_out + memory_scale_in) / 2
     
     results = {
         'configured_services': [],
         'errors': []
     }
     
-    for cluster_name, services in cluster_services.items():
-        for service_name in services:
-            try:
-                # Register scalable target
-                resource_id = f"service/{cluster_name}/{service_name}"
-                
+    def register_target(service_pair):
+        cluster_name, service_name = service_pair
+        try:
+            # Registering an existing target updates it in place, so one call suffices
+            appautoscaling.register_scalable_target(
+                ServiceNamespace='ecs',
+                ResourceId=f"service/{cluster_name}/{service_name}",
+                ScalableDimension='ecs:service:DesiredCount',
+                MinCapacity=min_capacity,
+                MaxCapacity=max_capacity
+            )
+        except Exception as e:
+            return str(e)
+        return None
+    
+    def put_policy(policy):
+        (cluster_name, service_name), (metric_name, metric_type, target_value) = policy
+        try:
+            appautoscaling.put_scaling_policy(
+                PolicyName=f"{service_name}-{metric_name}-target-tracking",
+                ServiceNamespace='ecs',
+                ResourceId=f"service/{cluster_name}/{service_name}",
+                ScalableDimension='ecs:service:DesiredCount',
+                PolicyType='TargetTrackingScaling',
+                TargetTrackingScalingPolicyConfiguration={
+                    'TargetValue': target_value,
+                    'PredefinedMetricSpecification': {
+                        'PredefinedMetricType': metric_type
+                    },
+                    'ScaleOutCooldown': 300,
+                    'ScaleInCooldown': 300
+                }
+            )
+        except Exception as e:
+            return str(e)
+        return None
+    
+    def remove_legacy_scaling(service_pair):
+        cluster_name, service_name = service_pair
+        try:
+            for suffix in LEGACY_POLICY_SUFFIXES:
                 try:
-                    appautoscaling.register_scalable_target(
+                    appautoscaling.delete_scaling_policy(
+                        PolicyName=f"{service_name}-{suffix}",
                         ServiceNamespace='ecs',
-                        ResourceId=resource_id,
-                        ScalableDimension='ecs:service:DesiredCount',
-                        MinCapacity=min_capacity,
-                        MaxCapacity=max_capacity
+                        ResourceId=f"service/{cluster_name}/{service_name}",
+                        ScalableDimension='ecs:service:DesiredCount'
                     )
-                except appautoscaling.exceptions.ValidationException:
-                    # Target might already be registered, try to update it
-                    appautoscaling.register_scalable_target(
-                        ServiceNamespace='ecs',
-                        ResourceId=resource_id,
-                        ScalableDimension='ecs:service:DesiredCount',
-                        MinCapacity=min_capacity,
-                        MaxCapacity=max_capacity
-                    )
-                
-                # Configure CPU scale-out policy
-                cpu_scale_out_policy = appautoscaling.put_scaling_policy(
-                    PolicyName=f"{service_name}-cpu-scale-out",
-                    ServiceNamespace='ecs',
-                    ResourceId=resource_id,
-                    ScalableDimension='ecs:service:DesiredCount',
-                    PolicyType='StepScaling',
-                    StepScalingPolicyConfiguration={
-                        'AdjustmentType': 'ChangeInCapacity',
-                        'StepAdjustments': [
-                            {
-                                'MetricIntervalLowerBound': 0,
-                                'ScalingAdjustment': 1
-                            }
-                        ],
-                        'Cooldown': 300
-                    }
-                )
-                
-                # Configure CPU scale-in policy
-                cpu_scale_in_policy = appautoscaling.put_scaling_policy(
-                    PolicyName=f"{service_name}-cpu-scale-in",
-                    ServiceNamespace='ecs',
-                    ResourceId=resource_id,
-                    ScalableDimension='ecs:service:DesiredCount',
-                    PolicyType='StepScaling',
-                    StepScalingPolicyConfiguration={
-                        'AdjustmentType': 'ChangeInCapacity',
-                        'StepAdjustments': [
-                            {
-                                'MetricIntervalUpperBound': 0,
-                                'ScalingAdjustment': -1
-                            }
-                        ],
-                        'Cooldown': 300
-                    }
-                )
-                
-                # Create CPU scale-out alarm
-                cloudwatch.put_metric_alarm(
-                    AlarmName=f"{service_name}-cpu-high",
-                    ComparisonOperator='GreaterThanThreshold',
-                    EvaluationPeriods=2,
-                    MetricName='CPUUtilization',
-                    Namespace='AWS/ECS',
-                    Period=60,
-                    Statistic='Average',
-                    Threshold=cpu_scale_out,
-                    AlarmDescription=f'Alarm when CPU exceeds {cpu_scale_out}%',
-                    Dimensions=[
-                        {
-                            'Name': 'ClusterName',
-                            'Value': cluster_name
-                        },
-                        {
-                            'Name': 'ServiceName',
-                            'Value': service_name
-                        }
-                    ],
-                    AlarmActions=[cpu_scale_out_policy['PolicyARN']]
-                )
-                
-                # Create CPU scale-in alarm
-                cloudwatch.put_metric_alarm(
-                    AlarmName=f"{service_name}-cpu-low",
-                    ComparisonOperator='LessThanThreshold',
-                    EvaluationPeriods=2,
-                    MetricName='CPUUtilization',
-                    Namespace='AWS/ECS',
-                    Period=60,
-                    Statistic='Average',
-                    Threshold=cpu_scale_in,
-                    AlarmDescription=f'Alarm when CPU is below {cpu_scale_in}%',
-                    Dimensions=[
-                        {
-                            'Name': 'ClusterName',
-                            'Value': cluster_name
-                        },
-                        {
-                            'Name': 'ServiceName',
-                            'Value': service_name
-                        }
-                    ],
-                    AlarmActions=[cpu_scale_in_policy['PolicyARN']]
-                )
-                
-                # Configure Memory scale-out policy
-                memory_scale_out_policy = appautoscaling.put_scaling_policy(
-                    PolicyName=f"{service_name}-memory-scale-out",
-                    ServiceNamespace='ecs',
-                    ResourceId=resource_id,
-                    ScalableDimension='ecs:service:DesiredCount',
-                    PolicyType='StepScaling',
-                    StepScalingPolicyConfiguration={
-                        'AdjustmentType': 'ChangeInCapacity',
-                        'StepAdjustments': [
-                            {
-                                'MetricIntervalLowerBound': 0,
-                                'ScalingAdjustment': 1
-                            }
-                        ],
-                        'Cooldown': 300
-                    }
-                )
-                
-                # Configure Memory scale-in policy
-                memory_scale_in_policy = appautoscaling.put_scaling_policy(
-                    PolicyName=f"{service_name}-memory-scale-in",
-                    ServiceNamespace='ecs',
-                    ResourceId=resource_id,
-                    ScalableDimension='ecs:service:DesiredCount',
-                    PolicyType='StepScaling',
-                    StepScalingPolicyConfiguration={
-                        'AdjustmentType': 'ChangeInCapacity',
-                        'StepAdjustments': [
-                            {
-                                'MetricIntervalUpperBound': 0,
-                                'ScalingAdjustment': -1
-                            }
-                        ],
-                        'Cooldown': 300
-                    }
-                )
-                
-                # Create Memory scale-out alarm
-                cloudwatch.put_metric_alarm(
-                    AlarmName=f"{service_name}-memory-high",
-                    ComparisonOperator='GreaterThanThreshold',
-                    EvaluationPeriods=2,
-                    MetricName='MemoryUtilization',
-                    Namespace='AWS/ECS',
-                    Period=60,
-                    Statistic='Average',
-                    Threshold=memory_scale_out,
-                    AlarmDescription=f'Alarm when Memory exceeds {memory_scale_out}%',
-                    Dimensions=[
-                        {
-                            'Name': 'ClusterName',
-                            'Value': cluster_name
-                        },
-                        {
-                            'Name': 'ServiceName',
-                            'Value': service_name
-                        }
-                    ],
-                    AlarmActions=[memory_scale_out_policy['PolicyARN']]
-                )
-                
-                # Create Memory scale-in alarm
-                cloudwatch.put_metric_alarm(
-                    AlarmName=f"{service_name}-memory-low",
-                    ComparisonOperator='LessThanThreshold',
-                    EvaluationPeriods=2,
-                    MetricName='MemoryUtilization',
-                    Namespace='AWS/ECS',
-                    Period=60,
-                    Statistic='Average',
-                    Threshold=memory_scale_in,
-                    AlarmDescription=f'Alarm when Memory is below {memory_scale_in}%',
-                    Dimensions=[
-                        {
-                            'Name': 'ClusterName',
-                            'Value': cluster_name
-                        },
-                        {
-                            'Name': 'ServiceName',
-                            'Value': service_name
-                        }
-                    ],
-                    AlarmActions=[memory_scale_in_policy['PolicyARN']]
-                )
-                
-                results['configured_services'].append({
-                    'cluster': cluster_name,
-                    'service': service_name,
-                    'min_capacity': min_capacity,
-                    'max_capacity': max_capacity,
-                    'cpu_thresholds': {
-                        'scale_out': cpu_scale_out,
-                        'scale_in': cpu_scale_in
-                    },
-                    'memory_thresholds': {
-                        'scale_out': memory_scale_out,
-                        'scale_in': memory_scale_in
-                    }
-                })
-                
-            except Exception as e:
-                results['errors'].append({
-                    'cluster': cluster_name,
-                    'service': service_name,
-                    'error': str(e)
-                })
+                except appautoscaling.exceptions.ObjectNotFoundException:
+                    pass
+            
+            # Deleting alarms that do not exist is not an error
+            cloudwatch.delete_alarms(
+                AlarmNames=[f"{service_name}-{suffix}" for suffix in LEGACY_ALARM_SUFFIXES]
+            )
+        except Exception as e:
+            return str(e)
+        return None
+    
+    service_pairs = [
+        (cluster_name, service_name)
+        for cluster_name, services in cluster_services.items()
+        for service_name in services
+    ]
+    
+    # Track CPU and memory around the midpoint of their scale-in/out thresholds;
+    # Application Auto Scaling manages the alarms for target tracking policies
+    policy_metrics = (
+        ('cpu', 'ECSServiceAverageCPUUtilization', cpu_target),
+        ('memory', 'ECSServiceAverageMemoryUtilization', memory_target)
+    )
+    
+    # Services and their policies are independent, so every call of a phase is
+    # issued concurrently: first all scalable targets, then all scaling policies,
+    # then removal of the step scaling setup they replace
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        errors = {
+            service_pair: error
+            for service_pair, error in zip(service_pairs, executor.map(register_target, service_pairs))
+            if error
+        }
+        
+        policies = [
+            (service_pair, metric)
+            for service_pair in service_pairs
+            if service_pair not in errors
+            for metric in policy_metrics
+        ]
+        for (service_pair, _), error in zip(policies, executor.map(put_policy, policies)):
+            if error and service_pair not in errors:
+                errors[service_pair] = error
+        
+        # Step scaling is only removed once both target tracking policies are in place,
+        # so a service is never left without scaling
+        migrated = [service_pair for service_pair in service_pairs if service_pair not in errors]
+        for service_pair, error in zip(migrated, executor.map(remove_legacy_scaling, migrated)):
+            if error:
+                errors[service_pair] = error
+    
+    for cluster_name, service_name in service_pairs:
+        if (cluster_name, service_name) in errors:
+            results['errors'].append({
+                'cluster': cluster_name,
+                'service': service_name,
+                'error': errors[(cluster_name, service_name)]
+            })
+            continue
+        
+        results['configured_services'].append({
+            'cluster': cluster_name,
+            'service': service_name,
+            'min_capacity': min_capacity,
+            'max_capacity': max_capacity,
+            'cpu_thresholds': {
+                'scale_out': cpu_scale_out,
+                'scale_in': cpu_scale_in,
+                'target': cpu_target
+            },
+            'memory_thresholds': {
+                'scale_out': memory_scale_out,
+                'scale_in': memory_scale_in,
+                'target': memory_target
+            }
+        })
     
     return {
         'statusCode': 200,
@@ -1,7 +1,37 @@
 import boto3
 import json
 import os
-from datetime import datetime, timedelta
+import time
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+# Shared client configuration: a larger connection pool for concurrent calls,
+# adaptive retries to absorb throttling, and TCP keep-alive on pooled connections
+CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    retries={'mode': 'adaptive', 'max_attempts': 10},
+    tcp_keepalive=True
+)
+
+# Maximum number of seconds to wait for an asynchronous AWS job to finish
+POLL_TIMEOUT_SECONDS = 120
+
+# Maximum number of items per category included in an SNS notification
+MAX_NOTIFICATION_ITEMS = 100
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
+
+# Analyzer ARNs resolved by name, reused across warm invocations
+_analyzer_arns = {}
 
 def lambda_handler(event, context):
     """
@@ -18,23 +48,35 @@ def lambda_handler(event, context):
     - ANALYZER_NAME: Name of the IAM Access Analyzer to use
     - MAX_FINDINGS: Maximum number of findings to return (default: 100)
     - SNS_TOPIC_ARN: Optional SNS topic ARN for notifications
+    - RESOURCE_TYPES: Optional comma-separated list of resource types to report findings for,
+      e.g. 'AWS::S3::Bucket,AWS::IAM::Role' (default: all resource types)
+    - SKIP_USERS_WITHOUT_POLICIES: Set to 'true' to skip the last-accessed analysis for users
+      with no inline policies, attached policies or group memberships (default: 'false')
     """
     # Get configuration from environment variables
     region = os.environ.get('REGION', 'us-east-1')
     analyzer_name = os.environ.get('ANALYZER_NAME', '')
     max_findings = int(os.environ.get('MAX_FINDINGS', 100))
     sns_topic_arn = os.environ.get('SNS_TOPIC_ARN', '')
+    resource_types_str = os.environ.get('RESOURCE_TYPES', '')
+    skip_users_without_policies = os.environ.get('SKIP_USERS_WITHOUT_POLICIES', 'false').lower() == 'true'
     
     # Initialize AWS clients
-    access_analyzer = boto3.client('accessanalyzer', region_name=region)
-    iam = boto3.client('iam', region_name=region)
+    access_analyzer = _client('accessanalyzer', region)
+    iam = _client('iam', region)
     
-    # Get or create analyzer if not specified
-    if not analyzer_name:
+    # Get or create analyzer if not specified, keeping its ARN for the findings lookup
+    if analyzer_name:
+        if (region, analyzer_name) not in _analyzer_arns:
+            _analyzer_arns[(region, analyzer_name)] = \
+                access_analyzer.get_analyzer(analyzerName=analyzer_name)['analyzer']['arn']
+        analyzer_arn = _analyzer_arns[(region, analyzer_name)]
+    else:
         # List existing analyzers
         analyzers = access_analyzer.list_analyzers()
         if analyzers['analyzers']:
             analyzer_name = analyzers['analyzers'][0]['name']
+            analyzer_arn = analyzers['analyzers'][0]['arn']
         else:
             # Create a new analyzer
             response = access_analyzer.create_analyzer(
@@ -42,53 +84,83 @@ def lambda_handler(event, context):
                 type='ACCOUNT'
             )
             analyzer_name = response['arn'].split('/')[-1]
+            analyzer_arn = response['arn']
+    
+    # Get active findings, filtered by resource type on the service side
+    findings_filter = {
+        'status': {
+            'eq': ['ACTIVE']
+        }
+    }
+    if resource_types_str:
+        findings_filter['resourceType'] = {
+            'eq': [resource_type.strip() for resource_type in resource_types_str.split(',')]
+        }
     
-    # Get active findings
     findings = []
     paginator = access_analyzer.get_paginator('list_findings')
     
+    # Stop paginating once MAX_FINDINGS findings have been retrieved
     for page in paginator.paginate(
-        analyzerArn=f"arn:aws:access-analyzer:{region}:{boto3.client('sts').get_caller_identity()['Account']}:analyzer/{analyzer_name}",
-        filter={
-            'status': {
-                'eq': ['ACTIVE']
-            }
-        },
-        maxResults=max_findings
+        analyzerArn=analyzer_arn,
+        filter=findings_filter,
+        PaginationConfig={'PageSize': max_findings, 'MaxItems': max_findings}
     ):
         findings.extend(page['findings'])
     
     # Analyze unused permissions (requires IAM Access Analyzer with unused access feature)
     unused_permissions = []
+    unused_cutoff = datetime.now(timezone.utc) - timedelta(days=90)
     try:
         # Get IAM users
-        users = iam.list_users()['Users']
+        paginator = iam.get_paginator('list_users')
+        users = [
+            user
+            for page in paginator.paginate(PaginationConfig={'PageSize': 1000})
+            for user in page['Users']
+        ]
         
-        for user in users:
-            username = user['UserName']
-            
-            # Get last accessed information
-            response = iam.generate_service_last_accessed_details(
-                Arn=user['Arn']
-            )
-            
-            job_id = response['JobId']
-            
-            # Wait for job to complete
-            complete = False
-            while not complete:
+        def start_job(user):
+            # Users without any permissions have nothing to analyze
+            if skip_users_without_policies and not user_has_policies(iam, user['UserName']):
+                return None
+            return iam.generate_service_last_accessed_details(Arn=user['Arn'])['JobId']
+        
+        # Start every last-accessed job up front so IAM processes them concurrently
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            job_ids = {
+                user['UserName']: job_id
+                for user, job_id in zip(users, executor.map(start_job, users))
+                if job_id
+            }
+        
+        # Poll the outstanding jobs together, backing off between passes
+        job_results = {}
+        pending = dict(job_ids)
+        
+        def check_pending_jobs():
+            for username, job_id in list(pending.items()):
                 response = iam.get_service_last_accessed_details(
                     JobId=job_id
                 )
                 
                 if response['JobStatus'] in ['COMPLETED', 'FAILED']:
-                    complete = True
-                else:
-                    import time
-                    time.sleep(1)
+                    job_results[username] = response
+                    del pending[username]
+            return pending
+        
+        try:
+            poll(check_pending_jobs, lambda remaining: not remaining)
+        except TimeoutError as e:
+            # Report on the users whose jobs did finish
+            print(f"Skipping {len(pending)} users with unfinished jobs: {str(e)}")
+        
+        for user in users:
+            username = user['UserName']
+            response = job_results.get(username)
             
             # Process results
-            if response['JobStatus'] == 'COMPLETED':
+            if response and response['JobStatus'] == 'COMPLETED':
                 for service in response['ServicesLastAccessed']:
                     if 'LastAuthenticated' not in service:
                         # Service never used
@@ -97,7 +169,7 @@ def lambda_handler(event, context):
                             'service': service['ServiceName'],
                             'status': 'Never used'
                         })
-                    elif (datetime.now() - service['LastAuthenticated'].replace(tzinfo=None)).days > 90:
+                    elif service['LastAuthenticated'] < unused_cutoff:
                         # Service not used in last 90 days
                         unused_permissions.append({
                             'user': username,
@@ -114,30 +186,66 @@ def lambda_handler(event, context):
         'unused_permissions': unused_permissions
     }
     
+    # Encode the report once and reuse it for the notification and the response
+    report = {
+        'message': 'IAM access analysis completed',
+        'results': results
+    }
+    body = json.dumps(report, separators=(',', ':'), default=str)
+    
     # Send to SNS if configured
     if sns_topic_arn:
-        sns = boto3.client('sns', region_name=region)
+        sns = _client('sns', region)
         
         # Count total findings
         total_findings = len(findings) + len(unused_permissions)
         
         if total_findings > 0:
-            message = {
-                'subject': f"IAM Access Analysis - {total_findings} findings",
-                'timestamp': datetime.now().isoformat(),
-                'findings': results
-            }
+            # Keep the notification well under the 256 KB SNS message limit
+            capped, truncated = cap_categories(results)
+            message = body
+            if truncated:
+                message = json.dumps({**report, 'results': capped, 'truncated': truncated},
+                                     separators=(',', ':'), default=str)
             
             sns.publish(
                 TopicArn=sns_topic_arn,
-                Message=json.dumps(message, indent=2),
-                Subject=message['subject']
+                Message=message,
+                Subject=f"IAM Access Analysis - {total_findings} findings"
             )
     
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'message': 'IAM access analysis completed',
-            'results': results
-        })
-    }
\ No newline at end of file
+        'body': body
+    }
+
+def poll(fetch, is_done, timeout=POLL_TIMEOUT_SECONDS):
+    """Call fetch until is_done accepts its result, backing off exponentially between calls"""
+    delay = 0.2
+    started = time.monotonic()
+    while True:
+        result = fetch()
+        if is_done(result):
+            return result
+        if time.monotonic() - started > timeout:
+            raise TimeoutError(f"Polling did not finish within {timeout} seconds")
+        time.sleep(delay)
+        delay = min(delay * 2, 4)
+
+def user_has_policies(iam, username):
+    """Return True if the user has an attached or inline policy or belongs to a group"""
+    return bool(
+        iam.list_attached_user_policies(UserName=username, MaxItems=1)['AttachedPolicies']
+        or iam.list_user_policies(UserName=username, MaxItems=1)['PolicyNames']
+        or iam.list_groups_for_user(UserName=username, MaxItems=1)['Groups']
+    )
+
+def cap_categories(categories, limit=MAX_NOTIFICATION_ITEMS):
+    """Return the categories with each list capped at limit items, plus how many were dropped"""
+    capped = {category: items[:limit] for category, items in categories.items()}
+    truncated = {
+        category: len(items) - limit
+        for category, items in categories.items()
+        if len(items) > limit
+    }
+    return capped, truncated
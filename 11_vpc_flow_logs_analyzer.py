@@ -1,9 +1,45 @@
 import boto3
+import ipaddress
 import json
 import os
 import re
+import time
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+# Shared client configuration: a connection pool sized for the concurrent queries
+# and adaptive retries to absorb throttling
+CLIENT_CONFIG = Config(
+    max_pool_connections=20,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
+# Maximum number of seconds to wait for a Logs Insights query to finish
+POLL_TIMEOUT_SECONDS = 900
+
+# Longest query string Logs Insights accepts
+MAX_QUERY_LENGTH = 10000
+
+# Maximum number of Logs Insights queries run at the same time
+MAX_CONCURRENT_QUERIES = 10
+
+# Splits an s3://bucket/key URL into its bucket and key
+S3_URL_PATTERN = re.compile(r'^s3://([^/]+)/(.+)$')
+
+# Parsed suspicious IP lists kept across warm invocations as {url: (etag, networks)}
+_suspicious_ip_cache = {}
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to analyze VPC Flow Logs for security insights.
@@ -14,6 +50,8 @@ def lambda_handler(event, context):
     - Potential port scanning activity
     - Traffic to known malicious IPs
     
+    Runs without findings return only a summary unless the event sets "verbose" to true.
+    
     Environment Variables:
     - REGION: AWS region to operate in (default: us-east-1)
     - LOG_GROUP: CloudWatch Logs group containing VPC Flow Logs
@@ -21,7 +59,7 @@ def lambda_handler(event, context):
     - REJECTION_THRESHOLD: Number of rejections to flag (default: 100)
     - PORT_SCAN_THRESHOLD: Number of distinct ports to consider as scanning (default: 15)
     - SNS_TOPIC_ARN: Optional SNS topic ARN for notifications
-    - SUSPICIOUS_IP_LIST: S3 URL to a list of suspicious IPs (optional)
+    - SUSPICIOUS_IP_LIST: S3 URL to a list of suspicious IPs or CIDR ranges, one per line (optional)
     """
     # Get configuration from environment variables
     region = os.environ.get('REGION', 'us-east-1')
@@ -39,42 +77,30 @@ def lambda_handler(event, context):
         }
     
     # Initialize AWS clients
-    logs = boto3.client('logs', region_name=region)
-    s3 = boto3.client('s3')
+    logs = _client('logs', region)
+    s3 = _client('s3')
     
     # Calculate time range for analysis
     end_time = datetime.now()
     start_time = end_time - timedelta(hours=analysis_period)
     
-    # Load suspicious IPs if provided
-    suspicious_ips = set()
+    # Load suspicious IPs and CIDR ranges if provided
+    suspicious_networks = set()
     if suspicious_ip_list:
         try:
             if suspicious_ip_list.startswith('s3://'):
-                # Parse S3 URL
-                s3_parts = suspicious_ip_list.replace('s3://', '').split('/')
-                bucket = s3_parts[0]
-                key = '/'.join(s3_parts[1:])
-                
-                response = s3.get_object(Bucket=bucket, Key=key)
-                ip_content = response['Body'].read().decode('utf-8')
-                
-                # Extract IPs from content
-                for line in ip_content.splitlines():
-                    line = line.strip()
-                    if line and not line.startswith('#'):
-                        suspicious_ips.add(line)
+                suspicious_networks = load_suspicious_networks(s3, suspicious_ip_list)
         except Exception as e:
             print(f"Error loading suspicious IP list: {str(e)}")
     
     # Query for rejected traffic
-    rejected_query = """
+    rejected_query = f"""
     filter action="REJECT"
     | stats count(*) as reject_count by srcAddr, dstAddr
-    | filter reject_count > {}
+    | filter reject_count > {rejection_threshold}
     | sort reject_count desc
     | limit 100
-    """.format(rejection_threshold)
+    """
     
     # Query for potential port scanning
     port_scan_query = """
@@ -84,30 +110,48 @@ def lambda_handler(event, context):
     | limit 100
     """.format(port_scan_threshold)
     
-    # Query for traffic to suspicious IPs
-    suspicious_ip_query = ""
-    if suspicious_ips:
-        ip_list = '|'.join(suspicious_ips)
-        suspicious_ip_query = f"""
-        filter dstAddr matches /^({ip_list})$/
-        | stats count(*) as hit_count by srcAddr, dstAddr
-        | sort hit_count desc
-        | limit 100
-        """
-    
-    # Execute queries
+    queries = {
+        'rejected_traffic': rejected_query,
+        'port_scanning': port_scan_query
+    }
+    
+    # Query for traffic to suspicious IPs, split across as many filtered queries as the
+    # Insights length limit requires
+    for i, suspicious_ip_query in enumerate(build_suspicious_ip_queries(suspicious_networks)):
+        queries[f"suspicious_ip_traffic_{i}"] = suspicious_ip_query
+    
+    # The queries are independent, so run them concurrently
+    with ThreadPoolExecutor(max_workers=min(len(queries), MAX_CONCURRENT_QUERIES)) as executor:
+        futures = {
+            category: executor.submit(execute_query, logs, log_group, query, start_time, end_time)
+            for category, query in queries.items()
+        }
+        query_results = {category: future.result() for category, future in futures.items()}
+    
+    # Merge the split suspicious IP queries; overlapping networks in different queries
+    # can report the same source and destination pair more than once
+    suspicious_ip_traffic = {}
+    for category, rows in query_results.items():
+        if category.startswith('suspicious_ip_traffic_'):
+            for row in rows:
+                suspicious_ip_traffic[(row.get('srcAddr'), row.get('dstAddr'))] = row
+    
     findings = {
-        'rejected_traffic': execute_query(logs, log_group, rejected_query, start_time, end_time),
-        'port_scanning': execute_query(logs, log_group, port_scan_query, start_time, end_time),
-        'suspicious_ip_traffic': execute_query(logs, log_group, suspicious_ip_query, start_time, end_time) if suspicious_ip_query else []
+        'rejected_traffic': query_results['rejected_traffic'],
+        'port_scanning': query_results['port_scanning'],
+        'suspicious_ip_traffic': sorted(
+            suspicious_ip_traffic.values(),
+            key=lambda row: float(row.get('hit_count', 0)),
+            reverse=True
+        )[:100]
     }
     
+    # Count total findings
+    total_findings = sum(map(len, findings.values()))
+    
     # Send to SNS if configured
     if sns_topic_arn:
-        sns = boto3.client('sns', region_name=region)
-        
-        # Count total findings
-        total_findings = sum(len(findings[category]) for category in findings)
+        sns = _client('sns', region)
         
         if total_findings > 0:
             message = {
@@ -119,17 +163,23 @@ def lambda_handler(event, context):
             
             sns.publish(
                 TopicArn=sns_topic_arn,
-                Message=json.dumps(message, indent=2),
+                Message=json.dumps(message, separators=(',', ':'), default=str),
                 Subject=message['subject']
             )
     
+    response = {
+        'message': 'VPC Flow Logs analysis completed',
+        'analysis_period': f"{analysis_period} hours",
+        'findings_count': total_findings
+    }
+    
+    # Clean runs only report the count unless the event asks for details
+    if total_findings > 0 or event.get('verbose'):
+        response['findings'] = findings
+    
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'message': 'VPC Flow Logs analysis completed',
-            'analysis_period': f"{analysis_period} hours",
-            'findings': findings
-        })
+        'body': json.dumps(response, separators=(',', ':'), default=str)
     }
 
 def execute_query(logs_client, log_group, query_string, start_time, end_time):
@@ -148,13 +198,11 @@ def execute_query(logs_client, log_group, query_string, start_time, end_time):
         
         query_id = start_query_response['queryId']
         
-        # Wait for query to complete
-        response = None
-        while response is None or response['status'] == 'Running':
-            response = logs_client.get_query_results(queryId=query_id)
-            if response['status'] == 'Running':
-                import time
-                time.sleep(1)
+        # Wait for query to complete, backing off between polls
+        response = poll(
+            lambda: logs_client.get_query_results(queryId=query_id),
+            lambda response: response['status'] not in ('Scheduled', 'Running')
+        )
         
         # Process results
         results = []
@@ -168,4 +216,98 @@ def execute_query(logs_client, log_group, query_string, start_time, end_time):
     
     except Exception as e:
         print(f"Error executing query: {str(e)}")
-        return []
\ No newline at end of file
+        return []
+
+def load_suspicious_networks(s3, url):
+    """Return the networks listed in an S3 object, re-downloading it only when its ETag changes"""
+    # Parse S3 URL
+    match = S3_URL_PATTERN.match(url)
+    if not match:
+        raise ValueError(f"Invalid S3 URL: {url}")
+    bucket, key = match.groups()
+    
+    cached_etag, cached_networks = _suspicious_ip_cache.get(url, (None, None))
+    request = {'Bucket': bucket, 'Key': key}
+    if cached_etag:
+        request['IfNoneMatch'] = cached_etag
+    
+    try:
+        response = s3.get_object(**request)
+    except s3.exceptions.ClientError as e:
+        # An unchanged object is answered with 304 Not Modified and no body
+        if e.response['Error']['Code'] in ('304', 'NotModified'):
+            return cached_networks
+        raise
+    
+    # Extract IPs and CIDR ranges while streaming the body instead of reading it whole
+    networks = set()
+    for line in response['Body'].iter_lines():
+        line = line.strip()
+        if line and not line.startswith(b'#'):
+            try:
+                networks.add(ipaddress.ip_network(line.decode('utf-8'), strict=False))
+            except ValueError:
+                print(f"Skipping invalid suspicious IP entry: {line.decode('utf-8', 'replace')}")
+    
+    networks = frozenset(networks)
+    _suspicious_ip_cache[url] = (response['ETag'], networks)
+    return networks
+
+def build_suspicious_ip_queries(networks):
+    """
+    Build Insights queries counting traffic to the suspicious networks, splitting the
+    networks across as many queries as needed to stay within MAX_QUERY_LENGTH
+    """
+    hosts = sorted(str(network.network_address) for network in networks
+                   if network.prefixlen == network.max_prefixlen)
+    ranges = sorted(str(network) for network in networks
+                    if network.prefixlen != network.max_prefixlen)
+    
+    # Each host costs its quoted address and a list separator, each range its own
+    # condition and an " or "; the budget leaves room for the empty host list clause
+    budget = MAX_QUERY_LENGTH - len(suspicious_ip_query([], [])) - len(' or dstAddr in []')
+    queries = []
+    chunk_hosts, chunk_ranges, chunk_size = [], [], 0
+    for host_list, value, cost in (
+        [(chunk_hosts, host, len(json.dumps(host)) + 2) for host in hosts] +
+        [(chunk_ranges, cidr, len(subnet_condition(cidr)) + 4) for cidr in ranges]
+    ):
+        if chunk_size + cost > budget and (chunk_hosts or chunk_ranges):
+            queries.append(suspicious_ip_query(chunk_hosts, chunk_ranges))
+            chunk_hosts.clear()
+            chunk_ranges.clear()
+            chunk_size = 0
+        host_list.append(value)
+        chunk_size += cost
+    
+    if chunk_hosts or chunk_ranges:
+        queries.append(suspicious_ip_query(chunk_hosts, chunk_ranges))
+    return queries
+
+def suspicious_ip_query(hosts, ranges):
+    """Build the Insights query counting traffic to the given hosts and CIDR ranges"""
+    conditions = [f"dstAddr in {json.dumps(hosts)}"] if hosts else []
+    conditions.extend(subnet_condition(cidr) for cidr in ranges)
+    return f"""
+    filter {' or '.join(conditions)}
+    | stats count(*) as hit_count by srcAddr, dstAddr
+    | sort hit_count desc
+    | limit 100
+    """
+
+def subnet_condition(cidr):
+    """Return the Insights condition matching destinations within a CIDR range"""
+    return f'isIpInSubnet(dstAddr, "{cidr}")'
+
+def poll(fetch, is_done, timeout=POLL_TIMEOUT_SECONDS):
+    """Call fetch until is_done accepts its result, backing off exponentially between calls"""
+    delay = 0.25
+    started = time.monotonic()
+    while True:
+        result = fetch()
+        if is_done(result):
+            return result
+        if time.monotonic() - started > timeout:
+            raise TimeoutError(f"Polling did not finish within {timeout} seconds")
+        time.sleep(delay)
+        delay = min(delay * 2, 5)
@@ -1,8 +1,27 @@
 import boto3
 import json
 import os
+import time
+from botocore.config import Config
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 
+# Shared client configuration: adaptive retries absorb LookupEvents throttling
+CLIENT_CONFIG = Config(retries={'max_attempts': 10, 'mode': 'adaptive'})
+
+# Maximum number of seconds to wait for a CloudTrail Lake query to finish
+POLL_TIMEOUT_SECONDS = 600
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to analyze CloudTrail events for suspicious activities.
@@ -13,23 +32,31 @@ def lambda_handler(event, context):
     - Sensitive API calls (e.g., IAM changes, security group modifications)
     - Unusual volume of API calls
     
+    Runs without findings return only a summary unless the event sets "verbose" to true.
+    
     Environment Variables:
     - REGION: AWS region to operate in (default: us-east-1)
     - LOOKBACK_HOURS: Hours of CloudTrail events to analyze (default: 24)
     - SNS_TOPIC_ARN: Optional SNS topic ARN for notifications
     - SENSITIVE_APIS: Comma-separated list of sensitive API actions to monitor
+    - EVENT_DATA_STORE: Optional CloudTrail Lake event data store ARN or ID to query for
+      lookback windows longer than LAKE_THRESHOLD_HOURS
+    - LAKE_THRESHOLD_HOURS: Lookback above which the event data store is queried instead
+      of LookupEvents (default: 6)
     """
     # Get configuration from environment variables
     region = os.environ.get('REGION', 'us-east-1')
     lookback_hours = int(os.environ.get('LOOKBACK_HOURS', 24))
     sns_topic_arn = os.environ.get('SNS_TOPIC_ARN', '')
     sensitive_apis_str = os.environ.get('SENSITIVE_APIS', 'DeleteTrail,StopLogging,DeleteFlowLogs,DeleteUser,CreateAccessKey,UpdateUser')
+    event_data_store = os.environ.get('EVENT_DATA_STORE', '')
+    lake_threshold_hours = int(os.environ.get('LAKE_THRESHOLD_HOURS', 6))
     
-    # Parse sensitive APIs
-    sensitive_apis = [api.strip() for api in sensitive_apis_str.split(',')]
+    # Parse sensitive APIs into a set for constant-time lookups per event
+    sensitive_apis = {api.strip() for api in sensitive_apis_str.split(',')}
     
     # Initialize AWS clients
-    cloudtrail = boto3.client('cloudtrail', region_name=region)
+    cloudtrail = _client('cloudtrail', region)
     
     # Calculate time range
     end_time = datetime.now()
@@ -43,109 +70,37 @@ def lambda_handler(event, context):
         'high_volume_apis': {}
     }
     
-    # Look for failed console logins
-    try:
-        response = cloudtrail.lookup_events(
-            LookupAttributes=[
-                {
-                    'AttributeKey': 'EventName',
-                    'AttributeValue': 'ConsoleLogin'
-                }
-            ],
-            StartTime=start_time,
-            EndTime=end_time
-        )
-        
-        for event in response['Events']:
-            event_data = json.loads(event['CloudTrailEvent'])
-            if event_data.get('responseElements', {}).get('ConsoleLogin') == 'Failure':
-                findings['failed_logins'].append({
-                    'eventTime': event_data['eventTime'],
-                    'sourceIPAddress': event_data['sourceIPAddress'],
-                    'userIdentity': event_data['userIdentity'],
-                    'errorMessage': event_data.get('errorMessage', 'Unknown error')
-                })
-    except Exception as e:
-        print(f"Error looking up failed logins: {str(e)}")
+    errors = []
     
-    # Look for sensitive API calls
-    for api in sensitive_apis:
+    if event_data_store and lookback_hours > lake_threshold_hours:
+        # Long windows are scanned far faster by CloudTrail Lake than by LookupEvents
         try:
-            response = cloudtrail.lookup_events(
-                LookupAttributes=[
-                    {
-                        'AttributeKey': 'EventName',
-                        'AttributeValue': api
-                    }
-                ],
-                StartTime=start_time,
-                EndTime=end_time
-            )
-            
-            for event in response['Events']:
-                event_data = json.loads(event['CloudTrailEvent'])
-                findings['sensitive_api_calls'].append({
-                    'eventTime': event_data['eventTime'],
-                    'eventName': event_data['eventName'],
-                    'sourceIPAddress': event_data['sourceIPAddress'],
-                    'userIdentity': event_data['userIdentity'],
-                    'resources': event_data.get('resources', [])
-                })
+            collect_lake_findings(cloudtrail, event_data_store, sensitive_apis, start_time, end_time, findings)
         except Exception as e:
-            print(f"Error looking up sensitive API {api}: {str(e)}")
-    
-    # Analyze API call volumes
-    try:
-        # Get all events in the time period
-        all_events = []
-        paginator = cloudtrail.get_paginator('lookup_events')
-        
-        for page in paginator.paginate(
-            StartTime=start_time,
-            EndTime=end_time
-        ):
-            all_events.extend(page['Events'])
-        
-        # Count API calls by user and API name
-        api_counts = {}
-        for event in all_events:
-            event_data = json.loads(event['CloudTrailEvent'])
-            user = event_data['userIdentity'].get('userName', event_data['userIdentity'].get('type', 'Unknown'))
-            api = event_data['eventName']
-            
-            if user not in api_counts:
-                api_counts[user] = {}
-            
-            if api not in api_counts[user]:
-                api_counts[user][api] = 0
+            print(f"Error querying CloudTrail Lake: {str(e)}")
+            errors.append({
+                'operation': 'query_cloudtrail_lake',
+                'error': str(e)
+            })
             
-            api_counts[user][api] += 1
-        
-        # Find high volume APIs (more than 100 calls)
-        for user, apis in api_counts.items():
-            for api, count in apis.items():
-                if count > 100:
-                    if user not in findings['high_volume_apis']:
-                        findings['high_volume_apis'][user] = []
-                    
-                    findings['high_volume_apis'][user].append({
-                        'api': api,
-                        'count': count
-                    })
-    except Exception as e:
-        print(f"Error analyzing API volumes: {str(e)}")
+            # Discard any partial Lake results and scan the window with LookupEvents instead
+            for items in findings.values():
+                items.clear()
+            collect_lookup_findings(cloudtrail, sensitive_apis, start_time, end_time, findings)
+    else:
+        collect_lookup_findings(cloudtrail, sensitive_apis, start_time, end_time, findings)
+    
+    # Count total findings
+    total_findings = (
+        len(findings['failed_logins']) + 
+        len(findings['sensitive_api_calls']) + 
+        len(findings['unusual_locations']) + 
+        sum(map(len, findings['high_volume_apis'].values()))
+    )
     
     # Send to SNS if configured
     if sns_topic_arn:
-        sns = boto3.client('sns', region_name=region)
-        
-        # Count total findings
-        total_findings = (
-            len(findings['failed_logins']) + 
-            len(findings['sensitive_api_calls']) + 
-            len(findings['unusual_locations']) + 
-            sum(len(apis) for user, apis in findings['high_volume_apis'].items())
-        )
+        sns = _client('sns', region)
         
         if total_findings > 0:
             message = {
@@ -157,15 +112,183 @@ def lambda_handler(event, context):
             
             sns.publish(
                 TopicArn=sns_topic_arn,
-                Message=json.dumps(message, indent=2),
+                Message=json.dumps(message, separators=(',', ':'), default=str),
                 Subject=message['subject']
             )
     
+    response = {
+        'message': 'CloudTrail analysis completed',
+        'analysis_period': f"{lookback_hours} hours",
+        'findings_count': total_findings
+    }
+    
+    # Report a failed Lake query even though LookupEvents covered the window
+    if errors:
+        response['errors'] = errors
+    
+    # Clean runs only report the count unless the event asks for details
+    if total_findings > 0 or event.get('verbose'):
+        response['findings'] = findings
+    
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'message': 'CloudTrail analysis completed',
-            'analysis_period': f"{lookback_hours} hours",
-            'findings': findings
+        'body': json.dumps(response, separators=(',', ':'), default=str)
+    }
+
+def collect_lookup_findings(cloudtrail, sensitive_apis, start_time, end_time, findings):
+    """Add the findings of a single paginated LookupEvents walk over the window to findings"""
+    # Walk the CloudTrail window once and derive every finding from the same events
+    api_counts = defaultdict(Counter)
+    try:
+        paginator = cloudtrail.get_paginator('lookup_events')
+        
+        for page in paginator.paginate(
+            StartTime=start_time,
+            EndTime=end_time
+        ):
+            for event in page['Events']:
+                event_data = json.loads(event['CloudTrailEvent'])
+                api = event_data['eventName']
+                
+                # Look for failed console logins
+                if api == 'ConsoleLogin' and \
+                        event_data.get('responseElements', {}).get('ConsoleLogin') == 'Failure':
+                    findings['failed_logins'].append({
+                        'eventTime': event_data['eventTime'],
+                        'sourceIPAddress': event_data['sourceIPAddress'],
+                        'userIdentity': event_data['userIdentity'],
+                        'errorMessage': event_data.get('errorMessage', 'Unknown error')
+                    })
+                
+                # Look for sensitive API calls
+                if api in sensitive_apis:
+                    findings['sensitive_api_calls'].append({
+                        'eventTime': event_data['eventTime'],
+                        'eventName': api,
+                        'sourceIPAddress': event_data['sourceIPAddress'],
+                        'userIdentity': event_data['userIdentity'],
+                        'resources': event_data.get('resources', [])
+                    })
+                
+                # Count API calls by user and API name
+                user = event_data['userIdentity'].get('userName', event_data['userIdentity'].get('type', 'Unknown'))
+                api_counts[user][api] += 1
+    except Exception as e:
+        print(f"Error looking up CloudTrail events: {str(e)}")
+    
+    # Find high volume APIs (more than 100 calls)
+    for user, apis in api_counts.items():
+        # most_common is sorted by count, so stop at the first API below the threshold
+        for api, count in apis.most_common():
+            if count <= 100:
+                break
+            
+            findings['high_volume_apis'].setdefault(user, []).append({
+                'api': api,
+                'count': count
+            })
+
+def collect_lake_findings(cloudtrail, event_data_store, sensitive_apis, start_time, end_time, findings):
+    """Add the findings of CloudTrail Lake queries over the window to findings"""
+    # Queries select FROM the event data store ID, the last part of its ARN
+    store_id = event_data_store.split('/')[-1]
+    time_filter = (
+        f"eventTime >= '{start_time.strftime('%Y-%m-%d %H:%M:%S')}' "
+        f"AND eventTime <= '{end_time.strftime('%Y-%m-%d %H:%M:%S')}'"
+    )
+    sensitive_api_list = ', '.join("'" + api.replace("'", "''") + "'" for api in sorted(sensitive_apis))
+    
+    events_query = f"""
+    SELECT eventTime, eventName, sourceIPAddress, errorMessage, resources,
+           element_at(responseElements, 'ConsoleLogin') AS consoleLogin,
+           userIdentity.type AS userType, userIdentity.principalid AS principalId,
+           userIdentity.arn AS userArn, userIdentity.accountid AS accountId,
+           userIdentity.username AS userName
+    FROM {store_id}
+    WHERE {time_filter}
+      AND ((eventName = 'ConsoleLogin' AND element_at(responseElements, 'ConsoleLogin') = 'Failure')
+           OR eventName IN ({sensitive_api_list}))
+    """
+    
+    # Count API calls by user and API name on the service side
+    volume_query = f"""
+    SELECT COALESCE(userIdentity.username, userIdentity.type, 'Unknown') AS userName,
+           eventName, COUNT(*) AS callCount
+    FROM {store_id}
+    WHERE {time_filter}
+    GROUP BY COALESCE(userIdentity.username, userIdentity.type, 'Unknown'), eventName
+    HAVING COUNT(*) > 100
+    ORDER BY callCount DESC
+    """
+    
+    # Start both queries first so they run concurrently on the service side
+    events_query_id = cloudtrail.start_query(QueryStatement=events_query)['QueryId']
+    volume_query_id = cloudtrail.start_query(QueryStatement=volume_query)['QueryId']
+    
+    for row in get_lake_query_rows(cloudtrail, events_query_id):
+        user_identity = {
+            key: row[column]
+            for key, column in (
+                ('type', 'userType'), ('principalId', 'principalId'), ('arn', 'userArn'),
+                ('accountId', 'accountId'), ('userName', 'userName')
+            )
+            if row.get(column)
+        }
+        
+        if row['eventName'] == 'ConsoleLogin' and row.get('consoleLogin') == 'Failure':
+            findings['failed_logins'].append({
+                'eventTime': row['eventTime'],
+                'sourceIPAddress': row.get('sourceIPAddress'),
+                'userIdentity': user_identity,
+                'errorMessage': row.get('errorMessage') or 'Unknown error'
+            })
+        
+        if row['eventName'] in sensitive_apis:
+            findings['sensitive_api_calls'].append({
+                'eventTime': row['eventTime'],
+                'eventName': row['eventName'],
+                'sourceIPAddress': row.get('sourceIPAddress'),
+                'userIdentity': user_identity,
+                'resources': row.get('resources') or []
+            })
+    
+    for row in get_lake_query_rows(cloudtrail, volume_query_id):
+        findings['high_volume_apis'].setdefault(row['userName'], []).append({
+            'api': row['eventName'],
+            'count': int(row['callCount'])
         })
-    }
\ No newline at end of file
+
+def get_lake_query_rows(cloudtrail, query_id):
+    """Wait for a CloudTrail Lake query to finish and return all of its rows as dicts"""
+    response = poll(
+        lambda: cloudtrail.get_query_results(QueryId=query_id),
+        lambda response: response['QueryStatus'] not in ('QUEUED', 'RUNNING')
+    )
+    if response['QueryStatus'] != 'FINISHED':
+        raise RuntimeError(
+            f"CloudTrail Lake query {query_id} ended as {response['QueryStatus']}: "
+            f"{response.get('ErrorMessage', '')}"
+        )
+    
+    rows = []
+    while True:
+        # Each row is a list of single-entry {column: value} dicts
+        for row in response.get('QueryResultRows', []):
+            rows.append({column: value for cell in row for column, value in cell.items()})
+        
+        if not response.get('NextToken'):
+            return rows
+        response = cloudtrail.get_query_results(QueryId=query_id, NextToken=response['NextToken'])
+
+def poll(fetch, is_done, timeout=POLL_TIMEOUT_SECONDS):
+    """Call fetch until is_done accepts its result, backing off exponentially between calls"""
+    delay = 0.25
+    started = time.monotonic()
+    while True:
+        result = fetch()
+        if is_done(result):
+            return result
+        if time.monotonic() - started > timeout:
+            raise TimeoutError(f"Polling did not finish within {timeout} seconds")
+        time.sleep(delay)
+        delay = min(delay * 2, 5)
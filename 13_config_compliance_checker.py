@@ -1,14 +1,37 @@
 import boto3
 import json
 import os
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# Shared client configuration: a connection pool sized for the concurrent lookups
+# and adaptive retries to absorb Config API throttling
+CLIENT_CONFIG = Config(
+    max_pool_connections=20,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
+# Maximum number of resource keys accepted by a single StartRemediationExecution request
+MAX_REMEDIATION_RESOURCE_KEYS = 100
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to check AWS Config compliance status.
     
     This function analyzes AWS Config rules compliance and reports non-compliant resources.
     It can also trigger remediation actions for specific non-compliant resources.
+    Fully compliant runs return only the summary unless the event sets "verbose" to true.
     
     Environment Variables:
     - REGION: AWS region to operate in (default: us-east-1)
@@ -26,31 +49,25 @@ def lambda_handler(event, context):
     remediation_rules = [rule.strip() for rule in remediation_rules_str.split(',')] if remediation_rules_str else []
     
     # Initialize AWS clients
-    config = boto3.client('config', region_name=region)
+    config = _client('config', region)
     
     # Get compliance status for all rules
     compliance_by_rule = {}
-    non_compliant_resources = {}
     
     paginator = config.get_paginator('describe_compliance_by_config_rule')
     for page in paginator.paginate(
         ComplianceTypes=['NON_COMPLIANT']
     ):
         for rule in page['ComplianceByConfigRules']:
-            rule_name = rule['ConfigRuleName']
-            compliance_by_rule[rule_name] = rule['Compliance']
-            
-            # Get non-compliant resources for this rule
-            resource_paginator = config.get_paginator('get_compliance_details_by_config_rule')
-            resources = []
-            
-            for resource_page in resource_paginator.paginate(
-                ConfigRuleName=rule_name,
-                ComplianceTypes=['NON_COMPLIANT']
-            ):
-                resources.extend(resource_page['EvaluationResults'])
-            
-            non_compliant_resources[rule_name] = resources
+            compliance_by_rule[rule['ConfigRuleName']] = rule['Compliance']
+    
+    # Get the non-compliant resources of every rule concurrently
+    rule_names = list(compliance_by_rule)
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        non_compliant_resources = dict(zip(
+            rule_names,
+            executor.map(lambda rule_name: get_non_compliant_evaluations(config, rule_name), rule_names)
+        ))
     
     # Trigger remediation if enabled
     remediation_results = {}
@@ -59,46 +76,60 @@ def lambda_handler(event, context):
             if rule_name in non_compliant_resources:
                 remediation_results[rule_name] = []
                 
-                for evaluation in non_compliant_resources[rule_name]:
-                    resource_id = evaluation['EvaluationResultIdentifier']['EvaluationResultQualifier']['ResourceId']
-                    resource_type = evaluation['EvaluationResultIdentifier']['EvaluationResultQualifier']['ResourceType']
+                resource_keys = [
+                    {
+                        'ResourceType': evaluation['EvaluationResultIdentifier']['EvaluationResultQualifier']['ResourceType'],
+                        'ResourceId': evaluation['EvaluationResultIdentifier']['EvaluationResultQualifier']['ResourceId']
+                    }
+                    for evaluation in non_compliant_resources[rule_name]
+                ]
+                
+                # Start remediation for up to 100 resources per request
+                for i in range(0, len(resource_keys), MAX_REMEDIATION_RESOURCE_KEYS):
+                    batch = resource_keys[i:i + MAX_REMEDIATION_RESOURCE_KEYS]
                     
                     try:
                         response = config.start_remediation_execution(
                             ConfigRuleName=rule_name,
-                            ResourceKeys=[
-                                {
-                                    'ResourceType': resource_type,
-                                    'ResourceId': resource_id
-                                }
-                            ]
+                            ResourceKeys=batch
                         )
-                        
-                        remediation_results[rule_name].append({
-                            'resource_id': resource_id,
-                            'resource_type': resource_type,
-                            'status': 'Remediation started',
-                            'execution_id': response['FailedItems'][0]['FailureMessage'] if response['FailedItems'] else 'Success'
-                        })
                     except Exception as e:
-                        remediation_results[rule_name].append({
-                            'resource_id': resource_id,
-                            'resource_type': resource_type,
-                            'status': 'Remediation failed',
-                            'error': str(e)
-                        })
+                        failures = {(key['ResourceType'], key['ResourceId']): str(e) for key in batch}
+                    else:
+                        failures = {
+                            (key['ResourceType'], key['ResourceId']): failed_item['FailureMessage']
+                            for failed_item in response['FailedItems']
+                            for key in failed_item['ResourceKeys']
+                        }
+                    
+                    for key in batch:
+                        failure = failures.get((key['ResourceType'], key['ResourceId']))
+                        if failure is None:
+                            remediation_results[rule_name].append({
+                                'resource_id': key['ResourceId'],
+                                'resource_type': key['ResourceType'],
+                                'status': 'Remediation started',
+                                'execution_id': 'Success'
+                            })
+                        else:
+                            remediation_results[rule_name].append({
+                                'resource_id': key['ResourceId'],
+                                'resource_type': key['ResourceType'],
+                                'status': 'Remediation failed',
+                                'error': failure
+                            })
     
     # Prepare summary
     summary = {
         'total_rules': len(compliance_by_rule),
         'non_compliant_rules': len(non_compliant_resources),
-        'total_non_compliant_resources': sum(len(resources) for resources in non_compliant_resources.values()),
+        'total_non_compliant_resources': sum(map(len, non_compliant_resources.values())),
         'remediation_attempted': len(remediation_results) if auto_remediate else 0
     }
     
     # Send to SNS if configured
     if sns_topic_arn and summary['non_compliant_rules'] > 0:
-        sns = boto3.client('sns', region_name=region)
+        sns = _client('sns', region)
         
         message = {
             'subject': f"AWS Config Compliance - {summary['non_compliant_rules']} non-compliant rules",
@@ -110,16 +141,34 @@ def lambda_handler(event, context):
         
         sns.publish(
             TopicArn=sns_topic_arn,
-            Message=json.dumps(message, indent=2),
+            Message=json.dumps(message, separators=(',', ':'), default=str),
             Subject=message['subject']
         )
     
+    response = {
+        'message': 'AWS Config compliance check completed',
+        'summary': summary
+    }
+    
+    # Compliant runs only report the summary unless the event asks for details
+    if summary['non_compliant_rules'] > 0 or event.get('verbose'):
+        response['non_compliant_resources'] = non_compliant_resources
+        response['remediation_results'] = remediation_results if auto_remediate else 'Auto-remediation disabled'
+    
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'message': 'AWS Config compliance check completed',
-            'summary': summary,
-            'non_compliant_resources': non_compliant_resources,
-            'remediation_results': remediation_results if auto_remediate else 'Auto-remediation disabled'
-        })
-    }
\ No newline at end of file
+        'body': json.dumps(response, separators=(',', ':'), default=str)
+    }
+
+def get_non_compliant_evaluations(config, rule_name):
+    """Return the evaluation results of all resources that are non-compliant with a rule"""
+    paginator = config.get_paginator('get_compliance_details_by_config_rule')
+    resources = []
+    
+    for page in paginator.paginate(
+        ConfigRuleName=rule_name,
+        ComplianceTypes=['NON_COMPLIANT']
+    ):
+        resources.extend(page['EvaluationResults'])
+    
+    return resources
@@ -1,7 +1,30 @@
 import boto3
 import json
 import os
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from operator import itemgetter
+
+# Shared client configuration: a connection pool sized for the concurrent lookups
+# and adaptive retries to absorb Route53 API throttling
+CLIENT_CONFIG = Config(
+    max_pool_connections=30,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
+# Maximum number of metric queries accepted by a single GetMetricData request
+MAX_METRIC_QUERIES_PER_CALL = 500
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
 
 def lambda_handler(event, context):
     """
@@ -12,6 +35,9 @@ def lambda_handler(event, context):
     - Monitor DNS record changes
     - Verify DNS propagation
     
+    Runs without failing health checks return only a summary unless the event sets
+    "verbose" to true.
+    
     Environment Variables:
     - REGION: AWS region to operate in (default: us-east-1)
     - HEALTH_CHECK_IDS: Comma-separated list of health check IDs to monitor (optional)
@@ -31,8 +57,8 @@ def lambda_handler(event, context):
     hosted_zone_ids = [id.strip() for id in hosted_zone_ids_str.split(',')] if hosted_zone_ids_str else []
     
     # Initialize AWS clients
-    route53 = boto3.client('route53', region_name=region)
-    cloudwatch = boto3.client('cloudwatch', region_name=region)
+    route53 = _client('route53', region)
+    cloudwatch = _client('cloudwatch', region)
     
     # Calculate time range
     end_time = datetime.now()
@@ -41,71 +67,92 @@ def lambda_handler(event, context):
     results = {
         'failing_health_checks': [],
         'dns_changes': [],
-        'health_check_status': {}
+        'health_check_status': {},
+        'errors': []
     }
     
-    # If no specific health checks provided, get all health checks
-    if not health_check_ids:
+    def get_health_check(health_check_id):
+        try:
+            # Get health check details
+            return route53.get_health_check(HealthCheckId=health_check_id)['HealthCheck']
+        except Exception as e:
+            print(f"Error checking health check {health_check_id}: {str(e)}")
+            return None
+    
+    if health_check_ids:
+        # Health checks are independent, so fetch their details concurrently
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            health_checks = list(executor.map(get_health_check, health_check_ids))
+    else:
+        # If no specific health checks provided, get all health checks; the listing
+        # already carries each configuration, so no per-check lookups are needed
         paginator = route53.get_paginator('list_health_checks')
-        for page in paginator.paginate():
-            for health_check in page['HealthChecks']:
-                health_check_ids.append(health_check['Id'])
+        health_checks = [
+            health_check
+            for page in paginator.paginate(PaginationConfig={'PageSize': 1000})
+            for health_check in page['HealthChecks']
+        ]
+        health_check_ids = [health_check['Id'] for health_check in health_checks]
+    
+    # Get the status history of all health checks from CloudWatch in batched requests
+    try:
+        health_check_statuses = get_health_check_statuses(cloudwatch, health_check_ids, start_time, end_time)
+    except Exception as e:
+        print(f"Error getting health check statuses: {str(e)}")
+        results['errors'].append({
+            'operation': 'get_health_check_statuses',
+            'error': str(e)
+        })
+        health_check_statuses = None
     
     # Check status of health checks
-    for health_check_id in health_check_ids:
-        try:
-            # Get health check details
-            health_check = route53.get_health_check(HealthCheckId=health_check_id)
+    for i, (health_check_id, health_check) in enumerate(zip(health_check_ids, health_checks)):
+        if health_check is None:
+            continue
+        
+        # Without status data the check's health cannot be judged, so report it as unknown
+        if health_check_statuses is None:
+            results['health_check_status'][health_check_id] = {
+                'config': health_check['HealthCheckConfig'],
+                'current_status': 'UNKNOWN',
+                'status_history': {'timestamps': [], 'statuses': []}
+            }
+            continue
+        status_points = health_check_statuses[i]
+        
+        # Process health check status
+        if status_points:
+            # Sort by timestamp
+            status_points.sort(key=itemgetter('Timestamp'))
             
-            # Get health check status from CloudWatch
-            response = cloudwatch.get_metric_statistics(
-                Namespace='AWS/Route53',
-                MetricName='HealthCheckStatus',
-                Dimensions=[
-                    {
-                        'Name': 'HealthCheckId',
-                        'Value': health_check_id
-                    }
-                ],
-                StartTime=start_time,
-                EndTime=end_time,
-                Period=300,  # 5-minute intervals
-                Statistics=['Minimum']
-            )
+            # Check if any status is 0 (failing)
+            failing_points = [point for point in status_points if point['Minimum'] == 0]
             
-            # Process health check status
-            status_points = response['Datapoints']
-            if status_points:
-                # Sort by timestamp
-                status_points.sort(key=lambda x: x['Timestamp'])
-                
-                # Check if any status is 0 (failing)
-                failing_points = [point for point in status_points if point['Minimum'] == 0]
-                
-                if failing_points:
-                    results['failing_health_checks'].append({
-                        'health_check_id': health_check_id,
-                        'config': health_check['HealthCheck']['HealthCheckConfig'],
-                        'failing_periods': len(failing_points),
-                        'first_failure': failing_points[0]['Timestamp'].isoformat(),
-                        'latest_status': status_points[-1]['Minimum']
-                    })
-                
-                # Add overall status
-                results['health_check_status'][health_check_id] = {
-                    'config': health_check['HealthCheck']['HealthCheckConfig'],
-                    'current_status': status_points[-1]['Minimum'],
-                    'status_history': [{'timestamp': point['Timestamp'].isoformat(), 'status': point['Minimum']} for point in status_points]
-                }
-            else:
-                results['health_check_status'][health_check_id] = {
-                    'config': health_check['HealthCheck']['HealthCheckConfig'],
-                    'current_status': 'Unknown - no data',
-                    'status_history': []
+            if failing_points:
+                results['failing_health_checks'].append({
+                    'health_check_id': health_check_id,
+                    'config': health_check['HealthCheckConfig'],
+                    'failing_periods': len(failing_points),
+                    'first_failure': failing_points[0]['Timestamp'].isoformat(),
+                    'latest_status': status_points[-1]['Minimum']
+                })
+            
+            # Add overall status
+            results['health_check_status'][health_check_id] = {
+                'config': health_check['HealthCheckConfig'],
+                'current_status': status_points[-1]['Minimum'],
+                # Parallel lists avoid repeating both keys for every datapoint
+                'status_history': {
+                    'timestamps': [point['Timestamp'].isoformat() for point in status_points],
+                    'statuses': [point['Minimum'] for point in status_points]
                 }
-                
-        except Exception as e:
-            print(f"Error checking health check {health_check_id}: {str(e)}")
+            }
+        else:
+            results['health_check_status'][health_check_id] = {
+                'config': health_check['HealthCheckConfig'],
+                'current_status': 'Unknown - no data',
+                'status_history': {'timestamps': [], 'statuses': []}
+            }
     
     # If no specific hosted zones provided, get all hosted zones
     if not hosted_zone_ids:
@@ -114,8 +161,7 @@ def lambda_handler(event, context):
             for zone in page['HostedZones']:
                 hosted_zone_ids.append(zone['Id'].replace('/hostedzone/', ''))
     
-    # Check for DNS changes
-    for zone_id in hosted_zone_ids:
+    def check_zone(zone_id):
         try:
             # Get change history
             paginator = route53.get_paginator('list_resource_record_sets')
@@ -129,35 +175,90 @@ def lambda_handler(event, context):
                 zone_records.extend(page['ResourceRecordSets'])
             
             # Add zone info to results
-            results['dns_changes'].append({
+            return {
                 'zone_id': zone_id,
                 'record_count': len(zone_records),
                 'note': 'Full change history requires CloudTrail integration'
-            })
+            }
             
         except Exception as e:
             print(f"Error checking hosted zone {zone_id}: {str(e)}")
+            return None
+    
+    # Check for DNS changes, one hosted zone per worker
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        results['dns_changes'] = [
+            zone_result
+            for zone_result in executor.map(check_zone, hosted_zone_ids)
+            if zone_result is not None
+        ]
     
     # Send to SNS if configured
-    if sns_topic_arn and results['failing_health_checks']:
-        sns = boto3.client('sns', region_name=region)
+    if sns_topic_arn and (results['failing_health_checks'] or results['errors']):
+        sns = _client('sns', region)
         
+        subject = f"Route53 Monitoring - {len(results['failing_health_checks'])} failing health checks"
+        if results['errors']:
+            subject += f", {len(results['errors'])} errors"
         message = {
-            'subject': f"Route53 Monitoring - {len(results['failing_health_checks'])} failing health checks",
+            'subject': subject,
             'timestamp': datetime.now().isoformat(),
             'results': results
         }
         
         sns.publish(
             TopicArn=sns_topic_arn,
-            Message=json.dumps(message, indent=2),
+            Message=json.dumps(message, separators=(',', ':'), default=str),
             Subject=message['subject']
         )
     
+    # Healthy runs only report counts unless the event asks for details
+    if not results['failing_health_checks'] and not results['errors'] and not event.get('verbose'):
+        results = {
+            'failing_health_checks': [],
+            'health_checks_checked': len(results['health_check_status']),
+            'hosted_zones_checked': len(results['dns_changes'])
+        }
+    
     return {
         'statusCode': 200,
         'body': json.dumps({
             'message': 'Route53 monitoring completed',
             'results': results
-        })
-    }
\ No newline at end of file
+        }, separators=(',', ':'), default=str)
+    }
+
+def get_health_check_statuses(cloudwatch, health_check_ids, start_time, end_time):
+    """Fetch the 5-minute minimum HealthCheckStatus datapoints of each health check"""
+    queries = [
+        {
+            'Id': f"hc_{i}",
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': 'AWS/Route53',
+                    'MetricName': 'HealthCheckStatus',
+                    'Dimensions': [{'Name': 'HealthCheckId', 'Value': health_check_id}]
+                },
+                'Period': 300,  # 5-minute intervals
+                'Stat': 'Minimum'
+            },
+            'ReturnData': True
+        }
+        for i, health_check_id in enumerate(health_check_ids)
+    ]
+    
+    # Datapoints keep the shape returned by GetMetricStatistics
+    statuses = [[] for _ in health_check_ids]
+    paginator = cloudwatch.get_paginator('get_metric_data')
+    
+    for i in range(0, len(queries), MAX_METRIC_QUERIES_PER_CALL):
+        batch = queries[i:i + MAX_METRIC_QUERIES_PER_CALL]
+        for page in paginator.paginate(MetricDataQueries=batch, StartTime=start_time, EndTime=end_time):
+            for result in page['MetricDataResults']:
+                index = int(result['Id'].split('_', 1)[1])
+                statuses[index].extend(
+                    {'Timestamp': timestamp, 'Minimum': value}
+                    for timestamp, value in zip(result['Timestamps'], result['Values'])
+                )
+    
+    return statuses
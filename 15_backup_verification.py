@@ -1,8 +1,30 @@
 import boto3
 import json
 import os
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+# Shared client configuration: a larger connection pool for concurrent calls
+# and adaptive retries to absorb throttling
+CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
+
+# Availability zone used for test restores, resolved once per region and reused across warm invocations
+_restore_availability_zones = {}
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to verify AWS Backup jobs and recovery points.
@@ -18,6 +40,7 @@ def lambda_handler(event, context):
     - BACKUP_VAULT_NAMES: Comma-separated list of backup vault names to check
     - DAYS_TO_CHECK: Number of days of backup history to verify (default: 7)
     - PERFORM_TEST_RESTORE: Whether to perform test restores (default: false)
+    - RESTORE_CONCURRENCY: Maximum number of test restores started concurrently (default: 16)
     - SNS_TOPIC_ARN: Optional SNS topic ARN for notifications
     """
     # Get configuration from environment variables
@@ -25,11 +48,14 @@ def lambda_handler(event, context):
     vault_names_str = os.environ.get('BACKUP_VAULT_NAMES', '')
     days_to_check = int(os.environ.get('DAYS_TO_CHECK', 7))
     perform_test_restore = os.environ.get('PERFORM_TEST_RESTORE', 'false').lower() == 'true'
+    restore_concurrency = int(os.environ.get('RESTORE_CONCURRENCY', 16))
     sns_topic_arn = os.environ.get('SNS_TOPIC_ARN', '')
     
     # Initialize AWS clients
-    backup = boto3.client('backup', region_name=region)
-    sns = boto3.client('sns', region_name=region) if sns_topic_arn else None
+    backup = _client('backup', region)
+    sns = _client('sns', region) if sns_topic_arn else None
+    # Created up front since boto3 client creation is not thread-safe
+    ec2 = _client('ec2', region) if perform_test_restore else None
     
     # Calculate time range
     end_time = datetime.now()
@@ -41,8 +67,12 @@ def lambda_handler(event, context):
     # If no vault names provided, get all vaults
     if not vault_names:
         try:
-            response = backup.list_backup_vaults()
-            vault_names = [vault['BackupVaultName'] for vault in response['BackupVaultList']]
+            paginator = backup.get_paginator('list_backup_vaults')
+            vault_names = [
+                vault['BackupVaultName']
+                for page in paginator.paginate(PaginationConfig={'PageSize': 1000})
+                for vault in page['BackupVaultList']
+            ]
         except Exception as e:
             return {
                 'statusCode': 500,
@@ -59,8 +89,13 @@ def lambda_handler(event, context):
         'test_restores': []
     }
     
-    # Check each vault
-    for vault_name in vault_names:
+    def verify_vault(vault_name):
+        vault_findings = {
+            'failed_jobs': [],
+            'missing_recovery_points': [],
+            'test_restores': []
+        }
+        restore_candidates = []
         vault_result = {
             'vault_name': vault_name,
             'jobs_checked': 0,
@@ -69,29 +104,37 @@ def lambda_handler(event, context):
             'valid_recovery_points': 0
         }
         
-        # Check backup jobs
+        # Check backup jobs, letting the service filter completed and failed jobs
         try:
             paginator = backup.get_paginator('list_backup_jobs')
             for page in paginator.paginate(
                 ByBackupVaultName=vault_name,
                 ByCreatedAfter=start_time,
-                ByState='COMPLETED'
+                ByState='COMPLETED',
+                PaginationConfig={'PageSize': 1000}
             ):
-                for job in page['BackupJobs']:
-                    vault_result['jobs_checked'] += 1
-                    
-                    if job['State'] == 'COMPLETED':
-                        vault_result['successful_jobs'] += 1
-                    else:
-                        results['failed_jobs'].append({
-                            'job_id': job['BackupJobId'],
-                            'resource_type': job['ResourceType'],
-                            'resource_arn': job['ResourceArn'],
-                            'state': job['State'],
-                            'creation_date': job['CreationDate'].isoformat(),
-                            'completion_date': job.get('CompletionDate', '').isoformat() if job.get('CompletionDate') else None,
-                            'message': job.get('StatusMessage', '')
-                        })
+                vault_result['successful_jobs'] += len(page['BackupJobs'])
+            
+            for page in paginator.paginate(
+                ByBackupVaultName=vault_name,
+                ByCreatedAfter=start_time,
+                ByState='FAILED',
+                PaginationConfig={'PageSize': 1000}
+            ):
+                vault_findings['failed_jobs'].extend(
+                    {
+                        'job_id': job['BackupJobId'],
+                        'resource_type': job['ResourceType'],
+                        'resource_arn': job['ResourceArn'],
+                        'state': job['State'],
+                        'creation_date': job['CreationDate'].isoformat(),
+                        'completion_date': job['CompletionDate'].isoformat() if job.get('CompletionDate') else None,
+                        'message': job.get('StatusMessage', '')
+                    }
+                    for job in page['BackupJobs']
+                )
+            
+            vault_result['jobs_checked'] = vault_result['successful_jobs'] + len(vault_findings['failed_jobs'])
         except Exception as e:
             vault_result['error_checking_jobs'] = str(e)
         
@@ -100,7 +143,8 @@ def lambda_handler(event, context):
             paginator = backup.get_paginator('list_recovery_points_by_backup_vault')
             for page in paginator.paginate(
                 BackupVaultName=vault_name,
-                ByCreatedAfter=start_time
+                ByCreatedAfter=start_time,
+                PaginationConfig={'PageSize': 1000}
             ):
                 for recovery_point in page['RecoveryPoints']:
                     vault_result['recovery_points_checked'] += 1
@@ -109,47 +153,11 @@ def lambda_handler(event, context):
                     if recovery_point['Status'] == 'COMPLETED':
                         vault_result['valid_recovery_points'] += 1
                         
-                        # Perform test restore if enabled
-                        if perform_test_restore:
-                            try:
-                                # Get recovery point details
-                                recovery_point_arn = recovery_point['RecoveryPointArn']
-                                resource_type = recovery_point['ResourceType']
-                                
-                                # Different restore approach based on resource type
-                                if resource_type == 'EBS':
-                                    # For EBS volumes, we can create a test volume
-                                    ec2 = boto3.client('ec2', region_name=region)
-                                    response = backup.get_recovery_point_restore_metadata(
-                                        BackupVaultName=vault_name,
-                                        RecoveryPointArn=recovery_point_arn
-                                    )
-                                    
-                                    # Start a restore job
-                                    restore_job = backup.start_restore_job(
-                                        RecoveryPointArn=recovery_point_arn,
-                                        Metadata={
-                                            'AvailabilityZone': ec2.describe_availability_zones()['AvailabilityZones'][0]['ZoneName'],
-                                            'RestoreTestOnly': 'true'
-                                        },
-                                        IamRoleArn=response['RestoreMetadata'].get('IAMRoleARN', '')
-                                    )
-                                    
-                                    results['test_restores'].append({
-                                        'recovery_point_arn': recovery_point_arn,
-                                        'resource_type': resource_type,
-                                        'restore_job_id': restore_job['RestoreJobId'],
-                                        'status': 'STARTED'
-                                    })
-                                    
-                            except Exception as e:
-                                results['test_restores'].append({
-                                    'recovery_point_arn': recovery_point_arn,
-                                    'resource_type': resource_type,
-                                    'error': str(e)
-                                })
+                        # Queue a test restore if enabled; only EBS volumes can be test restored
+                        if perform_test_restore and recovery_point['ResourceType'] == 'EBS':
+                            restore_candidates.append(recovery_point)
                     else:
-                        results['missing_recovery_points'].append({
+                        vault_findings['missing_recovery_points'].append({
                             'recovery_point_arn': recovery_point['RecoveryPointArn'],
                             'resource_type': recovery_point['ResourceType'],
                             'status': recovery_point['Status'],
@@ -158,40 +166,110 @@ def lambda_handler(event, context):
         except Exception as e:
             vault_result['error_checking_recovery_points'] = str(e)
         
-        results['verified_vaults'].append(vault_result)
+        return vault_result, vault_findings, restore_candidates
+    
+    # Vaults are independent, so check them concurrently
+    restore_candidates = []
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        for vault_result, vault_findings, vault_candidates in executor.map(verify_vault, vault_names):
+            results['verified_vaults'].append(vault_result)
+            for category, items in vault_findings.items():
+                results[category].extend(items)
+            restore_candidates.extend(vault_candidates)
+    
+    if restore_candidates:
+        # Test volumes are restored into the first available zone, looked up once per region
+        availability_zone = _restore_availability_zones.get(region)
+        if availability_zone is None:
+            try:
+                availability_zone = ec2.describe_availability_zones(
+                    Filters=[{'Name': 'state', 'Values': ['available']}]
+                )['AvailabilityZones'][0]['ZoneName']
+                _restore_availability_zones[region] = availability_zone
+            except Exception as e:
+                results['test_restores'].extend(
+                    {
+                        'recovery_point_arn': recovery_point['RecoveryPointArn'],
+                        'resource_type': recovery_point['ResourceType'],
+                        'error': f"Error looking up availability zone: {str(e)}"
+                    }
+                    for recovery_point in restore_candidates
+                )
+        
+        # Start test restores concurrently, bounded to stay within Backup API quotas
+        if availability_zone is not None:
+            with ThreadPoolExecutor(max_workers=restore_concurrency) as executor:
+                results['test_restores'].extend(executor.map(
+                    lambda recovery_point: start_test_restore(backup, recovery_point, availability_zone),
+                    restore_candidates
+                ))
+    
+    # Encode the report once and reuse it for the notification and the response
+    report = {
+        'message': 'Backup verification completed',
+        'time_range': {
+            'start': start_time.isoformat(),
+            'end': end_time.isoformat()
+        },
+        'summary': {
+            'vaults_checked': len(results['verified_vaults']),
+            'failed_jobs': len(results['failed_jobs']),
+            'missing_recovery_points': len(results['missing_recovery_points']),
+            'test_restores': len(results['test_restores'])
+        },
+        'results': results
+    }
+    body = json.dumps(report, separators=(',', ':'), default=str)
     
     # Send notification if SNS topic is configured
     if sns and sns_topic_arn:
         try:
-            # Prepare summary
-            summary = {
-                'timestamp': datetime.now().isoformat(),
-                'vaults_checked': len(results['verified_vaults']),
-                'failed_jobs': len(results['failed_jobs']),
-                'missing_recovery_points': len(results['missing_recovery_points']),
-                'test_restores': len(results['test_restores'])
-            }
-            
-            # Send notification
             sns.publish(
                 TopicArn=sns_topic_arn,
                 Subject=f"AWS Backup Verification Report - {end_time.strftime('%Y-%m-%d')}",
-                Message=json.dumps({
-                    'summary': summary,
-                    'details': results
-                }, indent=2)
+                Message=body
             )
         except Exception as e:
             print(f"Error sending SNS notification: {str(e)}")
     
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'message': 'Backup verification completed',
-            'time_range': {
-                'start': start_time.isoformat(),
-                'end': end_time.isoformat()
+        'body': body
+    }
+
+def start_test_restore(backup, recovery_point, availability_zone):
+    """Start a test restore of an EBS recovery point and return its result"""
+    # Get recovery point details
+    recovery_point_arn = recovery_point['RecoveryPointArn']
+    resource_type = recovery_point['ResourceType']
+    
+    try:
+        # For EBS volumes, we can create a test volume
+        response = backup.get_recovery_point_restore_metadata(
+            BackupVaultName=recovery_point['BackupVaultName'],
+            RecoveryPointArn=recovery_point_arn
+        )
+        
+        # Start a restore job
+        restore_job = backup.start_restore_job(
+            RecoveryPointArn=recovery_point_arn,
+            Metadata={
+                'AvailabilityZone': availability_zone,
+                'RestoreTestOnly': 'true'
             },
-            'results': results
-        })
-    }
\ No newline at end of file
+            IamRoleArn=response['RestoreMetadata'].get('IAMRoleARN', '')
+        )
+        
+        return {
+            'recovery_point_arn': recovery_point_arn,
+            'resource_type': resource_type,
+            'restore_job_id': restore_job['RestoreJobId'],
+            'status': 'STARTED'
+        }
+        
+    except Exception as e:
+        return {
+            'recovery_point_arn': recovery_point_arn,
+            'resource_type': resource_type,
+            'error': str(e)
+        }
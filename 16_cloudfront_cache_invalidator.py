@@ -1,9 +1,34 @@
 import boto3
 import json
 import os
+import posixpath
 import time
+from botocore.config import Config
 from datetime import datetime
 
+# Shared client configuration: a larger connection pool for concurrent calls
+# and adaptive retries to absorb throttling
+CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
+# Maximum number of paths accepted by a single CreateInvalidation request
+MAX_PATHS_PER_INVALIDATION = 3000
+
+# Maximum number of wildcard paths CloudFront allows in progress per distribution
+MAX_WILDCARD_PATHS = 15
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to automatically invalidate CloudFront cache when content changes.
@@ -19,12 +44,16 @@ def lambda_handler(event, context):
     - PATHS_TO_INVALIDATE: Comma-separated paths to invalidate (default: /*)
     - REGION: AWS region to operate in (default: us-east-1)
     - CALLER_REFERENCE_PREFIX: Prefix for caller reference (default: lambda-invalidation)
+    - COALESCE_THRESHOLD: Number of changed objects in one directory at which the directory
+      is invalidated with a single wildcard path; at most 15 directories are coalesced,
+      the largest first (default: 10)
     """
     # Get configuration from environment variables
     distribution_id = os.environ.get('DISTRIBUTION_ID')
     paths_to_invalidate_str = os.environ.get('PATHS_TO_INVALIDATE', '/*')
     region = os.environ.get('REGION', 'us-east-1')
     caller_reference_prefix = os.environ.get('CALLER_REFERENCE_PREFIX', 'lambda-invalidation')
+    coalesce_threshold = int(os.environ.get('COALESCE_THRESHOLD', 10))
     
     # Validate required parameters
     if not distribution_id:
@@ -50,39 +79,42 @@ def lambda_handler(event, context):
         
         # Use S3 paths if available, otherwise use configured paths
         if s3_paths:
-            paths_to_invalidate = s3_paths
+            paths_to_invalidate = coalesce_paths(s3_paths, coalesce_threshold)
     
     # Initialize CloudFront client
-    cloudfront = boto3.client('cloudfront', region_name=region)
+    cloudfront = _client('cloudfront', region)
     
     # Create a unique caller reference
     timestamp = int(time.time())
     caller_reference = f"{caller_reference_prefix}-{timestamp}"
     
     try:
-        # Create invalidation
-        response = cloudfront.create_invalidation(
-            DistributionId=distribution_id,
-            InvalidationBatch={
-                'Paths': {
-                    'Quantity': len(paths_to_invalidate),
-                    'Items': paths_to_invalidate
-                },
-                'CallerReference': caller_reference
-            }
-        )
-        
-        invalidation_id = response['Invalidation']['Id']
+        # Create invalidations of up to 3000 paths each
+        invalidation_ids = []
+        for i in range(0, len(paths_to_invalidate), MAX_PATHS_PER_INVALIDATION):
+            batch = paths_to_invalidate[i:i + MAX_PATHS_PER_INVALIDATION]
+            response = cloudfront.create_invalidation(
+                DistributionId=distribution_id,
+                InvalidationBatch={
+                    'Paths': {
+                        'Quantity': len(batch),
+                        'Items': batch
+                    },
+                    'CallerReference': f"{caller_reference}-{i // MAX_PATHS_PER_INVALIDATION}" if i else caller_reference
+                }
+            )
+            invalidation_ids.append(response['Invalidation']['Id'])
         
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': 'CloudFront invalidation created successfully',
                 'distribution_id': distribution_id,
-                'invalidation_id': invalidation_id,
+                'invalidation_id': invalidation_ids[0],
+                'invalidation_ids': invalidation_ids,
                 'paths_invalidated': paths_to_invalidate,
                 'timestamp': datetime.now().isoformat()
-            })
+            }, separators=(',', ':'))
         }
     except Exception as e:
         return {
@@ -93,4 +125,33 @@ def lambda_handler(event, context):
                 'distribution_id': distribution_id,
                 'paths_attempted': paths_to_invalidate
             })
-        }
\ No newline at end of file
+        }
+
+def coalesce_paths(paths, threshold):
+    """
+    Deduplicate paths and replace directories with at least threshold paths by a wildcard,
+    keeping the number of wildcard paths within MAX_WILDCARD_PATHS
+    """
+    paths_by_directory = {}
+    for path in set(paths):
+        paths_by_directory.setdefault(posixpath.dirname(path), []).append(path)
+    
+    # Wildcards already among the paths count against the limit, and the remaining slots
+    # go to the directories where a wildcard replaces the most paths
+    wildcard_slots = MAX_WILDCARD_PATHS - sum(1 for path in set(paths) if '*' in path)
+    candidates = sorted(
+        (directory for directory, directory_paths in paths_by_directory.items()
+         if threshold and len(directory_paths) >= threshold),
+        key=lambda directory: len(paths_by_directory[directory]),
+        reverse=True
+    )
+    wildcard_directories = set(candidates[:max(wildcard_slots, 0)])
+    
+    coalesced = []
+    for directory, directory_paths in sorted(paths_by_directory.items()):
+        # A wildcard path is billed as a single path however many objects it matches
+        if directory in wildcard_directories:
+            coalesced.append(posixpath.join(directory, '*'))
+        else:
+            coalesced.extend(sorted(directory_paths))
+    return coalesced
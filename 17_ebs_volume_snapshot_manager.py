@@ -1,7 +1,26 @@
 import boto3
 import json
 import os
-from datetime import datetime, timedelta
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+# Shared client configuration: a larger connection pool for concurrent calls
+# and adaptive retries to absorb throttling
+CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
 
 def lambda_handler(event, context):
     """
@@ -20,6 +39,7 @@ def lambda_handler(event, context):
     - TAG_KEY: Tag key to identify volumes to snapshot (default: Backup)
     - TAG_VALUE: Tag value to identify volumes to snapshot (default: true)
     - COPY_SNAPSHOTS: Whether to copy snapshots to target region (default: false)
+    - DELETE_CONCURRENCY: Maximum number of snapshots deleted concurrently (default: 8)
     """
     # Get configuration from environment variables
     region = os.environ.get('REGION', 'us-east-1')
@@ -28,35 +48,44 @@ def lambda_handler(event, context):
     tag_key = os.environ.get('TAG_KEY', 'Backup')
     tag_value = os.environ.get('TAG_VALUE', 'true')
     copy_snapshots = os.environ.get('COPY_SNAPSHOTS', 'false').lower() == 'true'
+    delete_concurrency = int(os.environ.get('DELETE_CONCURRENCY', 8))
     
     # Initialize EC2 client
-    ec2 = boto3.client('ec2', region_name=region)
-    target_ec2 = boto3.client('ec2', region_name=target_region) if target_region and copy_snapshots else None
+    ec2 = _client('ec2', region)
+    target_ec2 = _client('ec2', target_region) if target_region and copy_snapshots else None
     
     # Get current timestamp for tagging
     timestamp = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
     
-    # Calculate retention date
-    retention_date = datetime.now() - timedelta(days=retention_days)
+    # Calculate retention date, timezone-aware to compare directly with snapshot start times
+    retention_date = datetime.now(timezone.utc) - timedelta(days=retention_days)
     
     # Find volumes to snapshot
-    volumes_response = ec2.describe_volumes(
-        Filters=[
-            {
-                'Name': f'tag:{tag_key}',
-                'Values': [tag_value]
-            }
-        ]
-    )
+    paginator = ec2.get_paginator('describe_volumes')
+    volumes = [
+        volume
+        for page in paginator.paginate(
+            Filters=[
+                {
+                    'Name': f'tag:{tag_key}',
+                    'Values': [tag_value]
+                }
+            ],
+            PaginationConfig={'PageSize': 500}
+        )
+        for volume in page['Volumes']
+    ]
     
     snapshots_created = []
     snapshots_copied = []
     snapshots_deleted = []
     errors = []
     
-    # Create snapshots
-    for volume in volumes_response['Volumes']:
+    def snapshot_volume(volume):
         volume_id = volume['VolumeId']
+        volume_errors = []
+        created = None
+        copied = None
         
         # Get volume name tag if it exists
         volume_name = 'unnamed'
@@ -66,31 +95,31 @@ def lambda_handler(event, context):
                 break
         
         try:
-            # Create snapshot
+            # Create and tag the snapshot in a single request
             snapshot_response = ec2.create_snapshot(
                 VolumeId=volume_id,
-                Description=f"Automated snapshot of {volume_id} ({volume_name}) - {timestamp}"
+                Description=f"Automated snapshot of {volume_id} ({volume_name}) - {timestamp}",
+                TagSpecifications=[
+                    {
+                        'ResourceType': 'snapshot',
+                        'Tags': [
+                            {'Key': 'Name', 'Value': f"Snapshot-{volume_name}-{timestamp}"},
+                            {'Key': 'CreatedBy', 'Value': 'Lambda-EBS-Snapshot-Manager'},
+                            {'Key': 'SourceVolumeId', 'Value': volume_id},
+                            {'Key': 'CreationDate', 'Value': timestamp},
+                            {'Key': 'RetentionDays', 'Value': str(retention_days)}
+                        ]
+                    }
+                ]
             )
             
             snapshot_id = snapshot_response['SnapshotId']
             
-            # Tag the snapshot
-            ec2.create_tags(
-                Resources=[snapshot_id],
-                Tags=[
-                    {'Key': 'Name', 'Value': f"Snapshot-{volume_name}-{timestamp}"},
-                    {'Key': 'CreatedBy', 'Value': 'Lambda-EBS-Snapshot-Manager'},
-                    {'Key': 'SourceVolumeId', 'Value': volume_id},
-                    {'Key': 'CreationDate', 'Value': timestamp},
-                    {'Key': 'RetentionDays', 'Value': str(retention_days)}
-                ]
-            )
-            
-            snapshots_created.append({
+            created = {
                 'snapshot_id': snapshot_id,
                 'volume_id': volume_id,
                 'volume_name': volume_name
-            })
+            }
             
             # Copy snapshot to target region if enabled
             if target_region and copy_snapshots:
@@ -98,79 +127,91 @@ def lambda_handler(event, context):
                     copy_response = target_ec2.copy_snapshot(
                         SourceRegion=region,
                         SourceSnapshotId=snapshot_id,
-                        Description=f"Copy of {snapshot_id} from {region} - {timestamp}"
-                    )
-                    
-                    target_snapshot_id = copy_response['SnapshotId']
-                    
-                    # Tag the copied snapshot
-                    target_ec2.create_tags(
-                        Resources=[target_snapshot_id],
-                        Tags=[
-                            {'Key': 'Name', 'Value': f"Snapshot-{volume_name}-{timestamp}"},
-                            {'Key': 'CreatedBy', 'Value': 'Lambda-EBS-Snapshot-Manager'},
-                            {'Key': 'SourceVolumeId', 'Value': volume_id},
-                            {'Key': 'SourceRegion', 'Value': region},
-                            {'Key': 'SourceSnapshotId', 'Value': snapshot_id},
-                            {'Key': 'CreationDate', 'Value': timestamp},
-                            {'Key': 'RetentionDays', 'Value': str(retention_days)}
+                        Description=f"Copy of {snapshot_id} from {region} - {timestamp}",
+                        TagSpecifications=[
+                            {
+                                'ResourceType': 'snapshot',
+                                'Tags': [
+                                    {'Key': 'Name', 'Value': f"Snapshot-{volume_name}-{timestamp}"},
+                                    {'Key': 'CreatedBy', 'Value': 'Lambda-EBS-Snapshot-Manager'},
+                                    {'Key': 'SourceVolumeId', 'Value': volume_id},
+                                    {'Key': 'SourceRegion', 'Value': region},
+                                    {'Key': 'SourceSnapshotId', 'Value': snapshot_id},
+                                    {'Key': 'CreationDate', 'Value': timestamp},
+                                    {'Key': 'RetentionDays', 'Value': str(retention_days)}
+                                ]
+                            }
                         ]
                     )
                     
-                    snapshots_copied.append({
+                    copied = {
                         'source_snapshot_id': snapshot_id,
-                        'target_snapshot_id': target_snapshot_id,
+                        'target_snapshot_id': copy_response['SnapshotId'],
                         'volume_id': volume_id,
                         'target_region': target_region
-                    })
+                    }
                 except Exception as e:
-                    errors.append({
+                    volume_errors.append({
                         'operation': 'copy_snapshot',
                         'snapshot_id': snapshot_id,
                         'target_region': target_region,
                         'error': str(e)
                     })
         except Exception as e:
-            errors.append({
+            volume_errors.append({
                 'operation': 'create_snapshot',
                 'volume_id': volume_id,
                 'error': str(e)
             })
+        
+        return created, copied, volume_errors
+    
+    # Create snapshots, one volume per worker
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for created, copied, volume_errors in executor.map(snapshot_volume, volumes):
+            if created:
+                snapshots_created.append(created)
+            if copied:
+                snapshots_copied.append(copied)
+            errors.extend(volume_errors)
     
     # Delete old snapshots
     try:
-        snapshots_response = ec2.describe_snapshots(
-            Filters=[
-                {
-                    'Name': 'tag:CreatedBy',
-                    'Values': ['Lambda-EBS-Snapshot-Manager']
-                }
-            ],
-            OwnerIds=['self']
-        )
+        paginator = ec2.get_paginator('describe_snapshots')
+        snapshots = [
+            snapshot
+            for page in paginator.paginate(
+                Filters=[
+                    {
+                        'Name': 'tag:CreatedBy',
+                        'Values': ['Lambda-EBS-Snapshot-Manager']
+                    }
+                ],
+                OwnerIds=['self'],
+                PaginationConfig={'PageSize': 1000}
+            )
+            for snapshot in page['Snapshots']
+        ]
         
-        for snapshot in snapshots_response['Snapshots']:
-            snapshot_id = snapshot['SnapshotId']
-            start_time = snapshot['StartTime']
-            
-            # Convert to datetime object
-            if isinstance(start_time, datetime):
-                snapshot_date = start_time
-            else:
-                # If it's a string, parse it
-                snapshot_date = datetime.strptime(str(start_time), '%Y-%m-%d %H:%M:%S.%f%z')
-            
-            # Check if snapshot is older than retention period
-            if snapshot_date.replace(tzinfo=None) < retention_date:
-                try:
-                    ec2.delete_snapshot(SnapshotId=snapshot_id)
-                    snapshots_deleted.append(snapshot_id)
-                except Exception as e:
+        # Find snapshots older than the retention period
+        expired_snapshot_ids = [
+            snapshot['SnapshotId'] for snapshot in snapshots if snapshot['StartTime'] < retention_date
+        ]
+        
+        # Deletions are independent, so run them concurrently
+        with ThreadPoolExecutor(max_workers=delete_concurrency) as executor:
+            for snapshot_id, error in zip(
+                expired_snapshot_ids,
+                executor.map(lambda snapshot_id: delete_snapshot(ec2, snapshot_id), expired_snapshot_ids)
+            ):
+                if error:
                     errors.append({
                         'operation': 'delete_snapshot',
                         'snapshot_id': snapshot_id,
-                        'error': str(e)
+                        'error': error
                     })
+                else:
+                    snapshots_deleted.append(snapshot_id)
     except Exception as e:
         errors.append({
             'operation': 'list_snapshots',
@@ -180,45 +221,47 @@ def lambda_handler(event, context):
     # Delete old snapshots in target region if enabled
     if target_region and copy_snapshots:
         try:
-            target_snapshots_response = target_ec2.describe_snapshots(
-                Filters=[
-                    {
-                        'Name': 'tag:CreatedBy',
-                        'Values': ['Lambda-EBS-Snapshot-Manager']
-                    },
-                    {
-                        'Name': 'tag:SourceRegion',
-                        'Values': [region]
-                    }
-                ],
-                OwnerIds=['self']
-            )
+            paginator = target_ec2.get_paginator('describe_snapshots')
+            target_snapshots = [
+                snapshot
+                for page in paginator.paginate(
+                    Filters=[
+                        {
+                            'Name': 'tag:CreatedBy',
+                            'Values': ['Lambda-EBS-Snapshot-Manager']
+                        },
+                        {
+                            'Name': 'tag:SourceRegion',
+                            'Values': [region]
+                        }
+                    ],
+                    OwnerIds=['self'],
+                    PaginationConfig={'PageSize': 1000}
+                )
+                for snapshot in page['Snapshots']
+            ]
             
-            for snapshot in target_snapshots_response['Snapshots']:
-                snapshot_id = snapshot['SnapshotId']
-                start_time = snapshot['StartTime']
-                
-                # Convert to datetime object
-                if isinstance(start_time, datetime):
-                    snapshot_date = start_time
-                else:
-                    # If it's a string, parse it
-                    snapshot_date = datetime.strptime(str(start_time), '%Y-%m-%d %H:%M:%S.%f%z')
-                
-                # Check if snapshot is older than retention period
-                if snapshot_date.replace(tzinfo=None) < retention_date:
-                    try:
-                        target_ec2.delete_snapshot(SnapshotId=snapshot_id)
-                        snapshots_deleted.append({
-                            'snapshot_id': snapshot_id,
-                            'region': target_region
-                        })
-                    except Exception as e:
+            # Find snapshots older than the retention period
+            expired_snapshot_ids = [
+                snapshot['SnapshotId'] for snapshot in target_snapshots if snapshot['StartTime'] < retention_date
+            ]
+            
+            with ThreadPoolExecutor(max_workers=delete_concurrency) as executor:
+                for snapshot_id, error in zip(
+                    expired_snapshot_ids,
+                    executor.map(lambda snapshot_id: delete_snapshot(target_ec2, snapshot_id), expired_snapshot_ids)
+                ):
+                    if error:
                         errors.append({
                             'operation': 'delete_snapshot_target_region',
                             'snapshot_id': snapshot_id,
                             'region': target_region,
-                            'error': str(e)
+                            'error': error
+                        })
+                    else:
+                        snapshots_deleted.append({
+                            'snapshot_id': snapshot_id,
+                            'region': target_region
                         })
         except Exception as e:
             errors.append({
@@ -236,5 +279,13 @@ def lambda_handler(event, context):
             'snapshots_copied': snapshots_copied,
             'snapshots_deleted': snapshots_deleted,
             'errors': errors
-        })
-    }
\ No newline at end of file
+        }, separators=(',', ':'))
+    }
+
+def delete_snapshot(ec2, snapshot_id):
+    """Delete a snapshot and return the error message if the deletion failed"""
+    try:
+        ec2.delete_snapshot(SnapshotId=snapshot_id)
+    except Exception as e:
+        return str(e)
+    return None
@@ -1,9 +1,42 @@
 import boto3
 import json
 import os
-import base64
+from botocore.config import Config
+from collections import deque
 from datetime import datetime
 
+# Shared client configuration: a larger connection pool for concurrent calls
+# and adaptive retries to absorb throttling
+CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
+# Longest long poll allowed by ReceiveMessage
+MAX_WAIT_TIME_SECONDS = 20
+
+# Seconds kept free before the Lambda timeout to finish the batch in flight
+TIMEOUT_MARGIN_SECONDS = 5
+
+# Number of most recent errors returned in the report
+MAX_ERROR_SAMPLES = 100
+
+# Largest combined payload in bytes accepted by SendMessageBatch
+MAX_BATCH_PAYLOAD_BYTES = 262144
+
+# Number of errors buffered before they are written to S3 when archiving
+ERROR_FLUSH_SIZE = 500
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to process messages in SQS Dead Letter Queues.
@@ -23,7 +56,7 @@ def lambda_handler(event, context):
     - TARGET_QUEUE_URL: URL of queue to send reprocessed messages to (required if reprocessing)
     - ARCHIVE_TO_S3: Whether to archive messages to S3 (default: false)
     - S3_BUCKET: S3 bucket for archiving (required if archiving)
-    - S3_PREFIX: S3 prefix for archived messages (default: dlq-archive/)
+    - S3_PREFIX: S3 prefix for archived messages and errors (default: dlq-archive/)
     - SNS_TOPIC_ARN: SNS topic ARN for notifications (optional)
     """
     # Get configuration from environment variables
@@ -63,136 +96,231 @@ def lambda_handler(event, context):
         }
     
     # Initialize AWS clients
-    sqs = boto3.client('sqs', region_name=region)
-    s3 = boto3.client('s3', region_name=region) if archive_to_s3 else None
-    sns = boto3.client('sns', region_name=region) if sns_topic_arn else None
+    sqs = _client('sqs', region)
+    s3 = _client('s3', region) if archive_to_s3 else None
+    sns = _client('sns', region) if sns_topic_arn else None
     
     # Process messages
+    received_count = 0
     processed_count = 0
     reprocessed_count = 0
     archived_count = 0
-    errors = []
+    error_count = 0
+    
+    # Only recent errors are kept in memory; when archiving, all of them are written to S3
+    errors = deque(maxlen=MAX_ERROR_SAMPLES)
+    unflushed_errors = []
     
-    while processed_count < max_messages:
-        # Receive messages from DLQ
+    # The loop is bounded by messages received, so batches that keep failing and stay in
+    # the DLQ cannot keep it running until the timeout
+    while received_count < max_messages:
+        # Stop before the timeout so a received batch is never left half processed
+        remaining_seconds = context.get_remaining_time_in_millis() / 1000 - TIMEOUT_MARGIN_SECONDS
+        if remaining_seconds <= 0:
+            break
+        
+        # Receive messages from DLQ, long polling to avoid repeated empty receives
         response = sqs.receive_message(
             QueueUrl=dlq_url,
-            MaxNumberOfMessages=min(10, max_messages - processed_count),
+            MaxNumberOfMessages=min(10, max_messages - received_count),
             MessageAttributeNames=['All'],
             AttributeNames=['All'],
-            WaitTimeSeconds=1
+            WaitTimeSeconds=min(MAX_WAIT_TIME_SECONDS, int(remaining_seconds))
         )
         
         # Break if no messages
         if 'Messages' not in response:
             break
         
-        for message in response['Messages']:
-            message_id = message['MessageId']
-            receipt_handle = message['ReceiptHandle']
-            body = message['Body']
-            attributes = message.get('MessageAttributes', {})
-            
+        messages = response['Messages']
+        received_count += len(messages)
+        
+        # Batch entries and failures are keyed by position, since a receive may return
+        # the same MessageId more than once
+        failures = {}
+        
+        # Archive the whole batch to S3 as a single object
+        if archive_to_s3:
             try:
-                # Archive message to S3 if enabled
-                if archive_to_s3:
-                    timestamp = datetime.now().strftime('%Y/%m/%d/%H/%M/%S')
-                    s3_key = f"{s3_prefix}{timestamp}/{message_id}.json"
-                    
-                    # Prepare message data for archiving
-                    message_data = {
-                        'MessageId': message_id,
-                        'Body': body,
-                        'Attributes': message.get('Attributes', {}),
-                        'MessageAttributes': attributes,
-                        'ArchivedAt': datetime.now().isoformat()
+                archive_messages(s3, s3_bucket, s3_prefix, messages)
+                archived_count += len(messages)
+            except Exception as e:
+                for i, message in enumerate(messages):
+                    failures[str(i)] = {
+                        'message_id': message['MessageId'],
+                        'operation': 'archive_message',
+                        'error': str(e)
                     }
-                    
-                    # Upload to S3
-                    s3.put_object(
-                        Bucket=s3_bucket,
-                        Key=s3_key,
-                        Body=json.dumps(message_data, indent=2),
-                        ContentType='application/json'
-                    )
-                    
-                    archived_count += 1
-                
-                # Reprocess message if enabled
-                if reprocess_messages:
-                    # Send message to target queue
-                    message_attributes = {}
-                    
-                    # Convert message attributes to the format expected by send_message
-                    for attr_name, attr in attributes.items():
-                        message_attributes[attr_name] = {
-                            'DataType': attr['DataType'],
-                            'StringValue': attr.get('StringValue', ''),
-                            'BinaryValue': base64.b64decode(attr['BinaryValue']) if 'BinaryValue' in attr else b''
+        
+        # Send the remaining messages to the target queue, in as few requests as the
+        # batch payload limit allows
+        if reprocess_messages:
+            pending = [
+                {
+                    'Id': str(i),
+                    'MessageBody': message['Body'],
+                    'MessageAttributes': to_message_attributes(message.get('MessageAttributes', {}))
+                }
+                for i, message in enumerate(messages)
+                if str(i) not in failures
+            ]
+            for entries in split_entries_by_size(pending):
+                try:
+                    send_response = sqs.send_message_batch(QueueUrl=target_queue_url, Entries=entries)
+                    reprocessed_count += len(send_response.get('Successful', []))
+                    for failure in send_response.get('Failed', []):
+                        failures[failure['Id']] = {
+                            'message_id': messages[int(failure['Id'])]['MessageId'],
+                            'operation': 'reprocess_message',
+                            'error': failure.get('Message', failure['Code'])
                         }
-                    
-                    sqs.send_message(
-                        QueueUrl=target_queue_url,
-                        MessageBody=body,
-                        MessageAttributes=message_attributes
-                    )
-                    
-                    reprocessed_count += 1
-                
-                # Delete message from DLQ
-                sqs.delete_message(
-                    QueueUrl=dlq_url,
-                    ReceiptHandle=receipt_handle
-                )
-                
-                processed_count += 1
-                
+                except Exception as e:
+                    for entry in entries:
+                        failures[entry['Id']] = {
+                            'message_id': messages[int(entry['Id'])]['MessageId'],
+                            'operation': 'reprocess_message',
+                            'error': str(e)
+                        }
+        
+        # Only messages that were archived and forwarded are removed from the DLQ
+        handled = [
+            {'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']}
+            for i, message in enumerate(messages)
+            if str(i) not in failures
+        ]
+        if handled:
+            try:
+                delete_response = sqs.delete_message_batch(QueueUrl=dlq_url, Entries=handled)
+                processed_count += len(delete_response.get('Successful', []))
+                for failure in delete_response.get('Failed', []):
+                    failures[failure['Id']] = {
+                        'message_id': messages[int(failure['Id'])]['MessageId'],
+                        'operation': 'delete_message',
+                        'error': failure.get('Message', failure['Code'])
+                    }
             except Exception as e:
-                errors.append({
-                    'message_id': message_id,
-                    'operation': 'process_message',
-                    'error': str(e)
-                })
+                for entry in handled:
+                    failures[entry['Id']] = {
+                        'message_id': messages[int(entry['Id'])]['MessageId'],
+                        'operation': 'delete_message',
+                        'error': str(e)
+                    }
+        
+        error_count += len(failures)
+        errors.extend(failures.values())
+        if archive_to_s3:
+            unflushed_errors.extend(failures.values())
+            if len(unflushed_errors) >= ERROR_FLUSH_SIZE:
+                flush_errors(s3, s3_bucket, s3_prefix, unflushed_errors, errors)
+                unflushed_errors = []
+    
+    if unflushed_errors:
+        flush_errors(s3, s3_bucket, s3_prefix, unflushed_errors, errors)
+    
+    # Encode the report once and reuse it for the notification and the response
+    report = {
+        'message': 'SQS DLQ processing completed',
+        'timestamp': datetime.now().isoformat(),
+        'dlq_url': dlq_url,
+        'received_count': received_count,
+        'processed_count': processed_count,
+        'reprocessed_count': reprocessed_count,
+        'archived_count': archived_count,
+        'error_count': error_count,
+        'errors': list(errors)
+    }
+    body = json.dumps(report, separators=(',', ':'), default=str)
     
     # Send notification if enabled
     if sns and sns_topic_arn:
         try:
-            # Prepare summary
-            summary = {
-                'timestamp': datetime.now().isoformat(),
-                'dlq_url': dlq_url,
-                'processed_count': processed_count,
-                'reprocessed_count': reprocessed_count,
-                'archived_count': archived_count,
-                'errors': len(errors)
-            }
-            
-            # Send notification
             sns.publish(
                 TopicArn=sns_topic_arn,
                 Subject=f"SQS DLQ Processing Report - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                Message=json.dumps({
-                    'summary': summary,
-                    'details': {
-                        'errors': errors
-                    }
-                }, indent=2)
+                Message=body
             )
         except Exception as e:
-            errors.append({
+            report['error_count'] += 1
+            report['errors'].append({
                 'operation': 'send_notification',
                 'error': str(e)
             })
+            body = json.dumps(report, separators=(',', ':'), default=str)
     
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'message': 'SQS DLQ processing completed',
-            'timestamp': datetime.now().isoformat(),
-            'dlq_url': dlq_url,
-            'processed_count': processed_count,
-            'reprocessed_count': reprocessed_count,
-            'archived_count': archived_count,
-            'errors': errors
+        'body': body
+    }
+
+def archive_messages(s3, bucket, prefix, messages):
+    """Archive a batch of messages to S3 as one newline-delimited JSON object"""
+    archived_at = datetime.now()
+    records = (
+        json.dumps({
+            'MessageId': message['MessageId'],
+            'Body': message['Body'],
+            'Attributes': message.get('Attributes', {}),
+            'MessageAttributes': message.get('MessageAttributes', {}),
+            'ArchivedAt': archived_at.isoformat()
+        }, separators=(',', ':'), default=str)
+        for message in messages
+    )
+    
+    s3.put_object(
+        Bucket=bucket,
+        Key=f"{prefix}{archived_at.strftime('%Y/%m/%d/%H/%M/%S')}/batch-{messages[0]['MessageId']}.ndjson",
+        Body='\n'.join(records).encode(),
+        ContentType='application/x-ndjson'
+    )
+
+def flush_errors(s3, bucket, prefix, pending_errors, errors):
+    """Write buffered errors to S3 as newline-delimited JSON, recording a failed write in errors"""
+    written_at = datetime.now()
+    try:
+        s3.put_object(
+            Bucket=bucket,
+            Key=f"{prefix}errors/{written_at.strftime('%Y/%m/%d/%H/%M/%S-%f')}.ndjson",
+            Body='\n'.join(json.dumps(error, separators=(',', ':'), default=str) for error in pending_errors).encode(),
+            ContentType='application/x-ndjson'
+        )
+    except Exception as e:
+        errors.append({
+            'operation': 'archive_errors',
+            'error': str(e)
         })
-    }
\ No newline at end of file
+
+def split_entries_by_size(entries):
+    """Yield groups of send_message_batch entries whose combined payload fits in one request"""
+    batch = []
+    batch_size = 0
+    for entry in entries:
+        entry_size = len(entry['MessageBody'].encode())
+        for attr_name, attr in entry['MessageAttributes'].items():
+            value = attr.get('BinaryValue', attr.get('StringValue', ''))
+            if isinstance(value, str):
+                value = value.encode()
+            entry_size += len(attr_name.encode()) + len(attr['DataType'].encode()) + len(value)
+        
+        # An entry too large on its own is still sent alone so SQS reports its failure
+        if batch and batch_size + entry_size > MAX_BATCH_PAYLOAD_BYTES:
+            yield batch
+            batch = []
+            batch_size = 0
+        batch.append(entry)
+        batch_size += entry_size
+    
+    if batch:
+        yield batch
+
+def to_message_attributes(attributes):
+    """Convert received message attributes to the format expected by send_message"""
+    message_attributes = {}
+    for attr_name, attr in attributes.items():
+        message_attributes[attr_name] = {'DataType': attr['DataType']}
+        
+        # boto3 already returns binary values decoded, and only one value may be set
+        if 'BinaryValue' in attr:
+            message_attributes[attr_name]['BinaryValue'] = attr['BinaryValue']
+        else:
+            message_attributes[attr_name]['StringValue'] = attr.get('StringValue', '')
+    return message_attributes
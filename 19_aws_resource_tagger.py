@@ -1,8 +1,42 @@
 import boto3
 import json
 import os
+from botocore.config import Config
 from datetime import datetime
 
+# Configuration is read once per execution environment, whose variables never change
+REGION = os.environ.get('REGION', 'us-east-1')
+ENFORCE_TAGS = os.environ.get('ENFORCE_TAGS', 'false').lower() == 'true'
+MANDATORY_TAGS = tuple(tag.strip() for tag in os.environ.get('MANDATORY_TAGS', 'Name,Environment').split(','))
+TAG_REPORT_BUCKET = os.environ.get('TAG_REPORT_BUCKET')
+
+try:
+    DEFAULT_TAGS = json.loads(os.environ.get('DEFAULT_TAGS', '{"ManagedBy": "Lambda"}'))
+except json.JSONDecodeError:
+    DEFAULT_TAGS = {"ManagedBy": "Lambda"}
+
+# Shared client configuration: kept-alive pooled connections are reused across warm
+# invocations, and adaptive retries absorb tagging API throttling
+CLIENT_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=32,
+    connect_timeout=3,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
+# Maximum number of values accepted by a single EC2 filter
+MAX_FILTER_VALUES = 200
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to automatically tag AWS resources.
@@ -20,31 +54,15 @@ def lambda_handler(event, context):
     - MANDATORY_TAGS: Comma-separated list of mandatory tag keys (default: "Name,Environment")
     - TAG_REPORT_BUCKET: S3 bucket for tag compliance reports (optional)
     """
-    # Get configuration from environment variables
-    region = os.environ.get('REGION', 'us-east-1')
-    default_tags_str = os.environ.get('DEFAULT_TAGS', '{"ManagedBy": "Lambda"}')
-    enforce_tags = os.environ.get('ENFORCE_TAGS', 'false').lower() == 'true'
-    mandatory_tags_str = os.environ.get('MANDATORY_TAGS', 'Name,Environment')
-    tag_report_bucket = os.environ.get('TAG_REPORT_BUCKET')
-    
-    # Parse default tags
-    try:
-        default_tags = json.loads(default_tags_str)
-    except json.JSONDecodeError:
-        default_tags = {"ManagedBy": "Lambda"}
-    
-    # Parse mandatory tags
-    mandatory_tags = [tag.strip() for tag in mandatory_tags_str.split(',')]
-    
-    # Initialize AWS clients
-    ec2 = boto3.client('ec2', region_name=region)
-    s3 = boto3.client('s3', region_name=region)
-    rds = boto3.client('rds', region_name=region)
-    dynamodb = boto3.client('dynamodb', region_name=region)
-    lambda_client = boto3.client('lambda', region_name=region)
+    # Take a single timestamp for the tags, the report and the response
+    now = datetime.now()
+    timestamp = now.isoformat()
     
     # Add creation timestamp to default tags
-    default_tags['CreatedAt'] = datetime.now().isoformat()
+    default_tags = {**DEFAULT_TAGS, 'CreatedAt': timestamp}
+    
+    # EC2, S3 and RDS all take tags as Key/Value pairs
+    tags = [{'Key': k, 'Value': v} for k, v in default_tags.items()]
     
     # Process CloudTrail events
     resources_tagged = []
@@ -52,149 +70,35 @@ def lambda_handler(event, context):
     errors = []
     
     if 'detail' in event and 'eventName' in event['detail']:
-        event_name = event['detail']['eventName']
+        event_handler = EVENT_HANDLERS.get(event['detail']['eventName'])
         
-        # Handle EC2 instance creation
-        if event_name == 'RunInstances':
+        if event_handler:
             try:
-                instance_ids = []
-                for item in event['detail']['responseElements']['instancesSet']['items']:
-                    instance_ids.append(item['instanceId'])
-                
-                if instance_ids:
-                    # Convert default tags to EC2 format
-                    ec2_tags = [{'Key': k, 'Value': v} for k, v in default_tags.items()]
-                    
-                    # Tag instances
-                    ec2.create_tags(
-                        Resources=instance_ids,
-                        Tags=ec2_tags
-                    )
-                    
-                    resources_tagged.extend([
-                        {'resource_type': 'ec2:instance', 'resource_id': instance_id}
-                        for instance_id in instance_ids
-                    ])
-                    
-                    # Check for mandatory tags if enforcing
-                    if enforce_tags:
-                        for instance_id in instance_ids:
-                            response = ec2.describe_tags(
-                                Filters=[
-                                    {'Name': 'resource-id', 'Values': [instance_id]}
-                                ]
-                            )
-                            
-                            existing_tag_keys = [tag['Key'] for tag in response['Tags']]
-                            missing_tags = [tag for tag in mandatory_tags if tag not in existing_tag_keys]
-                            
-                            if missing_tags:
-                                resources_missing_tags.append({
-                                    'resource_type': 'ec2:instance',
-                                    'resource_id': instance_id,
-                                    'missing_tags': missing_tags
-                                })
+                tagged, missing = event_handler(event, REGION, tags, MANDATORY_TAGS, ENFORCE_TAGS)
+                resources_tagged.extend(tagged)
+                resources_missing_tags.extend(missing)
             except Exception as e:
                 errors.append({
-                    'operation': 'tag_ec2_instances',
-                    'error': str(e)
-                })
-        
-        # Handle S3 bucket creation
-        elif event_name == 'CreateBucket':
-            try:
-                bucket_name = event['detail']['requestParameters']['bucketName']
-                
-                # Convert default tags to S3 format
-                s3_tags = {'TagSet': [{'Key': k, 'Value': v} for k, v in default_tags.items()]}
-                
-                # Tag bucket
-                s3.put_bucket_tagging(
-                    Bucket=bucket_name,
-                    Tagging=s3_tags
-                )
-                
-                resources_tagged.append({
-                    'resource_type': 's3:bucket',
-                    'resource_id': bucket_name
-                })
-                
-                # Check for mandatory tags if enforcing
-                if enforce_tags:
-                    response = s3.get_bucket_tagging(Bucket=bucket_name)
-                    
-                    existing_tag_keys = [tag['Key'] for tag in response['TagSet']]
-                    missing_tags = [tag for tag in mandatory_tags if tag not in existing_tag_keys]
-                    
-                    if missing_tags:
-                        resources_missing_tags.append({
-                            'resource_type': 's3:bucket',
-                            'resource_id': bucket_name,
-                            'missing_tags': missing_tags
-                        })
-            except Exception as e:
-                errors.append({
-                    'operation': 'tag_s3_bucket',
-                    'error': str(e)
-                })
-        
-        # Handle RDS instance creation
-        elif event_name == 'CreateDBInstance':
-            try:
-                db_instance_id = event['detail']['requestParameters']['dBInstanceIdentifier']
-                
-                # Convert default tags to RDS format
-                rds_tags = [{'Key': k, 'Value': v} for k, v in default_tags.items()]
-                
-                # Tag DB instance
-                rds.add_tags_to_resource(
-                    ResourceName=f"arn:aws:rds:{region}:{event['account']}:db:{db_instance_id}",
-                    Tags=rds_tags
-                )
-                
-                resources_tagged.append({
-                    'resource_type': 'rds:db',
-                    'resource_id': db_instance_id
-                })
-                
-                # Check for mandatory tags if enforcing
-                if enforce_tags:
-                    response = rds.list_tags_for_resource(
-                        ResourceName=f"arn:aws:rds:{region}:{event['account']}:db:{db_instance_id}"
-                    )
-                    
-                    existing_tag_keys = [tag['Key'] for tag in response['TagList']]
-                    missing_tags = [tag for tag in mandatory_tags if tag not in existing_tag_keys]
-                    
-                    if missing_tags:
-                        resources_missing_tags.append({
-                            'resource_type': 'rds:db',
-                            'resource_id': db_instance_id,
-                            'missing_tags': missing_tags
-                        })
-            except Exception as e:
-                errors.append({
-                    'operation': 'tag_rds_instance',
+                    'operation': event_handler.__name__,
                     'error': str(e)
                 })
     
     # Generate tag compliance report if bucket is configured
-    if tag_report_bucket:
+    if TAG_REPORT_BUCKET:
         try:
             # Prepare report data
             report = {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': timestamp,
                 'resources_tagged': resources_tagged,
                 'resources_missing_tags': resources_missing_tags,
                 'errors': errors
             }
             
             # Upload report to S3
-            timestamp = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
-            s3.put_object(
-                Bucket=tag_report_bucket,
-                Key=f"tag-reports/{timestamp}.json",
-                Body=json.dumps(report, indent=2),
+            _client('s3', REGION).put_object(
+                Bucket=TAG_REPORT_BUCKET,
+                Key=f"tag-reports/{now.strftime('%Y-%m-%d-%H-%M-%S')}.json",
+                Body=json.dumps(report, separators=(',', ':'), default=str),
                 ContentType='application/json'
             )
         except Exception as e:
@@ -207,9 +111,133 @@ def lambda_handler(event, context):
         'statusCode': 200,
         'body': json.dumps({
             'message': 'Resource tagging completed',
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': timestamp,
             'resources_tagged': resources_tagged,
             'resources_missing_tags': resources_missing_tags,
             'errors': errors
-        })
-    }
\ No newline at end of file
+        }, separators=(',', ':'), default=str)
+    }
+
+def tag_ec2_instances(event, region, tags, mandatory_tags, enforce_tags):
+    """Tag the instances launched by a RunInstances event and return the tagged and non-compliant resources"""
+    ec2 = _client('ec2', region)
+    resources_tagged = []
+    resources_missing_tags = []
+    
+    instance_ids = []
+    for item in event['detail']['responseElements']['instancesSet']['items']:
+        instance_ids.append(item['instanceId'])
+    
+    if instance_ids:
+        # Tag instances
+        ec2.create_tags(
+            Resources=instance_ids,
+            Tags=tags
+        )
+        
+        resources_tagged.extend([
+            {'resource_type': 'ec2:instance', 'resource_id': instance_id}
+            for instance_id in instance_ids
+        ])
+        
+        # Check for mandatory tags if enforcing
+        if enforce_tags:
+            # Look up the tags of all instances at once, up to 200 resource IDs per filter
+            existing_tag_keys = {instance_id: set() for instance_id in instance_ids}
+            paginator = ec2.get_paginator('describe_tags')
+            for i in range(0, len(instance_ids), MAX_FILTER_VALUES):
+                for page in paginator.paginate(
+                    Filters=[
+                        {'Name': 'resource-id', 'Values': instance_ids[i:i + MAX_FILTER_VALUES]}
+                    ]
+                ):
+                    for tag in page['Tags']:
+                        existing_tag_keys[tag['ResourceId']].add(tag['Key'])
+            
+            for instance_id in instance_ids:
+                missing_tags = [tag for tag in mandatory_tags if tag not in existing_tag_keys[instance_id]]
+                
+                if missing_tags:
+                    resources_missing_tags.append({
+                        'resource_type': 'ec2:instance',
+                        'resource_id': instance_id,
+                        'missing_tags': missing_tags
+                    })
+    
+    return resources_tagged, resources_missing_tags
+
+def tag_s3_bucket(event, region, tags, mandatory_tags, enforce_tags):
+    """Tag the bucket created by a CreateBucket event and return the tagged and non-compliant resources"""
+    s3 = _client('s3', region)
+    resources_missing_tags = []
+    
+    bucket_name = event['detail']['requestParameters']['bucketName']
+    
+    # Tag bucket
+    s3.put_bucket_tagging(
+        Bucket=bucket_name,
+        Tagging={'TagSet': tags}
+    )
+    
+    resources_tagged = [{
+        'resource_type': 's3:bucket',
+        'resource_id': bucket_name
+    }]
+    
+    # Check for mandatory tags if enforcing
+    if enforce_tags:
+        response = s3.get_bucket_tagging(Bucket=bucket_name)
+        
+        existing_tag_keys = {tag['Key'] for tag in response['TagSet']}
+        missing_tags = [tag for tag in mandatory_tags if tag not in existing_tag_keys]
+        
+        if missing_tags:
+            resources_missing_tags.append({
+                'resource_type': 's3:bucket',
+                'resource_id': bucket_name,
+                'missing_tags': missing_tags
+            })
+    
+    return resources_tagged, resources_missing_tags
+
+def tag_rds_instance(event, region, tags, mandatory_tags, enforce_tags):
+    """Tag the DB instance created by a CreateDBInstance event and return the tagged and non-compliant resources"""
+    rds = _client('rds', region)
+    resources_missing_tags = []
+    
+    db_instance_id = event['detail']['requestParameters']['dBInstanceIdentifier']
+    db_instance_arn = f"arn:aws:rds:{region}:{event['account']}:db:{db_instance_id}"
+    
+    # Tag DB instance
+    rds.add_tags_to_resource(
+        ResourceName=db_instance_arn,
+        Tags=tags
+    )
+    
+    resources_tagged = [{
+        'resource_type': 'rds:db',
+        'resource_id': db_instance_id
+    }]
+    
+    # Check for mandatory tags if enforcing
+    if enforce_tags:
+        response = rds.list_tags_for_resource(ResourceName=db_instance_arn)
+        
+        existing_tag_keys = {tag['Key'] for tag in response['TagList']}
+        missing_tags = [tag for tag in mandatory_tags if tag not in existing_tag_keys]
+        
+        if missing_tags:
+            resources_missing_tags.append({
+                'resource_type': 'rds:db',
+                'resource_id': db_instance_id,
+                'missing_tags': missing_tags
+            })
+    
+    return resources_tagged, resources_missing_tags
+
+# CloudTrail event names mapped to the function tagging the resources they create
+EVENT_HANDLERS = {
+    'RunInstances': tag_ec2_instances,
+    'CreateBucket': tag_s3_bucket,
+    'CreateDBInstance': tag_rds_instance
+}
@@ -1,7 +1,67 @@
 import boto3
+import heapq
+import io
 import json
 import os
+import statistics
+import time
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from operator import itemgetter
+
+# Configuration is read once per execution environment, whose variables never change
+REGION = os.environ.get('REGION', 'us-east-1')
+API_IDS = tuple(api_id.strip() for api_id in os.environ.get('API_IDS', '').split(',') if api_id.strip())
+DAYS_TO_ANALYZE = int(os.environ.get('DAYS_TO_ANALYZE', 7))
+ERROR_THRESHOLD = float(os.environ.get('ERROR_THRESHOLD', 5))
+LATENCY_THRESHOLD_MS = int(os.environ.get('LATENCY_THRESHOLD_MS', 1000))
+S3_REPORT_BUCKET = os.environ.get('S3_REPORT_BUCKET', '')
+
+# Shared client configuration: kept-alive pooled connections are reused across warm
+# invocations, and adaptive retries absorb API Gateway and CloudWatch throttling
+CLIENT_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=32,
+    connect_timeout=3,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
+# Maximum number of metric queries accepted by a single GetMetricData request
+MAX_METRIC_QUERIES_PER_CALL = 500
+
+# CloudWatch metrics and statistics collected for endpoints that received requests
+ENDPOINT_METRICS = (
+    ('4XXError', 'Sum'),
+    ('5XXError', 'Sum'),
+    ('Latency', 'Average')
+)
+
+# Reports above 5 MB are uploaded in parts, at most 4 at a time
+REPORT_TRANSFER_CONFIG = TransferConfig(multipart_threshold=5 * 1024 * 1024, max_concurrency=4)
+
+# Seconds API Gateway listings are reused for; API topology changes far less often
+# than the daily metric periods analyzed
+API_CACHE_TTL_SECONDS = 600
+
+# API Gateway listings cached across warm invocations as key -> (expiry, response)
+_api_cache = {}
+
+# Clients are cached at module scope so warm invocations reuse them
+_clients = {}
+
+def _client(service_name, region=None):
+    """Return a boto3 client for the service and region, creating it on first use"""
+    key = (service_name, region)
+    if key not in _clients:
+        _clients[key] = boto3.client(service_name, region_name=region, config=CLIENT_CONFIG)
+    return _clients[key]
+
+# Create the clients during the init phase so loading their service models is not
+# part of the first invocation
+for service_name in ('apigateway', 'cloudwatch', 's3') if S3_REPORT_BUCKET else ('apigateway', 'cloudwatch'):
+    _client(service_name, REGION)
 
 def lambda_handler(event, context):
     """
@@ -21,32 +81,22 @@ def lambda_handler(event, context):
     - LATENCY_THRESHOLD_MS: Latency threshold in milliseconds (default: 1000)
     - S3_REPORT_BUCKET: Optional S3 bucket for storing reports
     """
-    # Get configuration from environment variables
-    region = os.environ.get('REGION', 'us-east-1')
-    api_ids_str = os.environ.get('API_IDS', '')
-    days_to_analyze = int(os.environ.get('DAYS_TO_ANALYZE', 7))
-    error_threshold = float(os.environ.get('ERROR_THRESHOLD', 5))
-    latency_threshold = int(os.environ.get('LATENCY_THRESHOLD_MS', 1000))
-    s3_report_bucket = os.environ.get('S3_REPORT_BUCKET', '')
-    
     # Initialize AWS clients
-    apigw = boto3.client('apigateway', region_name=region)
-    cloudwatch = boto3.client('cloudwatch', region_name=region)
-    logs = boto3.client('logs', region_name=region)
-    s3 = boto3.client('s3', region_name=region) if s3_report_bucket else None
+    apigw = _client('apigateway', REGION)
+    cloudwatch = _client('cloudwatch', REGION)
+    s3 = _client('s3', REGION) if S3_REPORT_BUCKET else None
     
     # Calculate time range
     end_time = datetime.now()
-    start_time = end_time - timedelta(days=days_to_analyze)
+    start_time = end_time - timedelta(days=DAYS_TO_ANALYZE)
     
-    # Parse API IDs
-    api_ids = [api_id.strip() for api_id in api_ids_str.split(',')] if api_ids_str else []
+    api_ids = list(API_IDS)
     
     # If no API IDs provided, get all APIs
     if not api_ids:
         try:
-            response = apigw.get_rest_apis()
-            api_ids = [api['id'] for api in response['items']]
+            rest_apis = cached(('rest_apis',), lambda: list_items(apigw, 'get_rest_apis'))
+            api_ids = [api['id'] for api in rest_apis]
         except Exception as e:
             return {
                 'statusCode': 500,
@@ -63,8 +113,12 @@ def lambda_handler(event, context):
         'high_latency_endpoints': []
     }
     
-    # Analyze each API
-    for api_id in api_ids:
+    def analyze_api(api_id):
+        api_findings = {
+            'high_traffic_endpoints': [],
+            'high_error_endpoints': [],
+            'high_latency_endpoints': []
+        }
         api_result = {
             'api_id': api_id,
             'endpoints_analyzed': 0,
@@ -75,164 +129,117 @@ def lambda_handler(event, context):
         
         try:
             # Get API details
-            api_details = apigw.get_rest_api(restApiId=api_id)
+            api_details = cached(('rest_api', api_id), lambda: apigw.get_rest_api(restApiId=api_id))
             api_name = api_details.get('name', 'Unknown')
             api_result['api_name'] = api_name
             
             # Get resources/endpoints
-            resources = apigw.get_resources(restApiId=api_id)
+            resources = cached(('resources', api_id), lambda: list_items(apigw, 'get_resources', restApiId=api_id))
+            endpoints = [
+                (resource.get('path', '/'), method)
+                for resource in resources
+                for method in resource.get('resourceMethods', {})
+            ]
+            api_result['endpoints_analyzed'] = len(endpoints)
             
-            for resource in resources['items']:
-                resource_path = resource.get('path', '/')
-                resource_methods = resource.get('resourceMethods', {})
-                
-                for method in resource_methods:
-                    endpoint = f"{method}:{resource_path}"
-                    api_result['endpoints_analyzed'] += 1
-                    
-                    # Get request count
-                    count_response = cloudwatch.get_metric_statistics(
-                        Namespace='AWS/ApiGateway',
-                        MetricName='Count',
-                        Dimensions=[
-                            {'Name': 'ApiId', 'Value': api_id},
-                            {'Name': 'Resource', 'Value': resource_path},
-                            {'Name': 'Method', 'Value': method},
-                            {'Name': 'Stage', 'Value': 'prod'}  # Assuming 'prod' stage, adjust as needed
-                        ],
-                        StartTime=start_time,
-                        EndTime=end_time,
-                        Period=86400,  # Daily
-                        Statistics=['Sum']
-                    )
-                    
-                    request_count = sum(point['Sum'] for point in count_response.get('Datapoints', []))
-                    api_result['total_requests'] += request_count
-                    
-                    # Get error count (4xx and 5xx)
-                    error_response = cloudwatch.get_metric_statistics(
-                        Namespace='AWS/ApiGateway',
-                        MetricName='4XXError',
-                        Dimensions=[
-                            {'Name': 'ApiId', 'Value': api_id},
-                            {'Name': 'Resource', 'Value': resource_path},
-                            {'Name': 'Method', 'Value': method},
-                            {'Name': 'Stage', 'Value': 'prod'}
-                        ],
-                        StartTime=start_time,
-                        EndTime=end_time,
-                        Period=86400,
-                        Statistics=['Sum']
-                    )
-                    
-                    error_4xx = sum(point['Sum'] for point in error_response.get('Datapoints', []))
-                    
-                    error_response = cloudwatch.get_metric_statistics(
-                        Namespace='AWS/ApiGateway',
-                        MetricName='5XXError',
-                        Dimensions=[
-                            {'Name': 'ApiId', 'Value': api_id},
-                            {'Name': 'Resource', 'Value': resource_path},
-                            {'Name': 'Method', 'Value': method},
-                            {'Name': 'Stage', 'Value': 'prod'}
-                        ],
-                        StartTime=start_time,
-                        EndTime=end_time,
-                        Period=86400,
-                        Statistics=['Sum']
-                    )
-                    
-                    error_5xx = sum(point['Sum'] for point in error_response.get('Datapoints', []))
-                    total_errors = error_4xx + error_5xx
-                    api_result['error_count'] += total_errors
-                    
-                    # Get latency
-                    latency_response = cloudwatch.get_metric_statistics(
-                        Namespace='AWS/ApiGateway',
-                        MetricName='Latency',
-                        Dimensions=[
-                            {'Name': 'ApiId', 'Value': api_id},
-                            {'Name': 'Resource', 'Value': resource_path},
-                            {'Name': 'Method', 'Value': method},
-                            {'Name': 'Stage', 'Value': 'prod'}
-                        ],
-                        StartTime=start_time,
-                        EndTime=end_time,
-                        Period=86400,
-                        Statistics=['Average']
-                    )
-                    
-                    avg_latency = 0
-                    if latency_response.get('Datapoints'):
-                        avg_latency = sum(point['Average'] for point in latency_response['Datapoints']) / len(latency_response['Datapoints'])
-                    
-                    # Check for high traffic
-                    if request_count > 0:
-                        # Add to high traffic if in top 10% of endpoints
-                        results['high_traffic_endpoints'].append({
-                            'api_id': api_id,
-                            'api_name': api_name,
-                            'endpoint': endpoint,
-                            'request_count': request_count
-                        })
-                    
-                    # Check for high error rate
-                    if request_count > 0 and (total_errors / request_count * 100) > error_threshold:
-                        results['high_error_endpoints'].append({
-                            'api_id': api_id,
-                            'api_name': api_name,
-                            'endpoint': endpoint,
-                            'error_rate': (total_errors / request_count * 100),
-                            'request_count': request_count,
-                            'error_count': total_errors
-                        })
-                    
-                    # Check for high latency
-                    if avg_latency > latency_threshold:
-                        results['high_latency_endpoints'].append({
-                            'api_id': api_id,
-                            'api_name': api_name,
-                            'endpoint': endpoint,
-                            'avg_latency_ms': avg_latency,
-                            'request_count': request_count
-                        })
+            # Fetch the request count of every endpoint and the overall API latency first
+            metrics = [
+                ('Count', endpoint_dimensions(api_id, resource_path, method), 'Sum')
+                for resource_path, method in endpoints
+            ]
+            metrics.append(('Latency', [{'Name': 'ApiId', 'Value': api_id}], 'Average'))
+            *count_values, api_latency_values = get_metric_values(cloudwatch, metrics, start_time, end_time)
             
             # Calculate overall API latency
-            latency_response = cloudwatch.get_metric_statistics(
-                Namespace='AWS/ApiGateway',
-                MetricName='Latency',
-                Dimensions=[
-                    {'Name': 'ApiId', 'Value': api_id}
-                ],
-                StartTime=start_time,
-                EndTime=end_time,
-                Period=86400,
-                Statistics=['Average']
-            )
+            if api_latency_values:
+                api_result['avg_latency'] = statistics.fmean(api_latency_values)
             
-            if latency_response.get('Datapoints'):
-                api_result['avg_latency'] = sum(point['Average'] for point in latency_response['Datapoints']) / len(latency_response['Datapoints'])
+            # Endpoints without requests have no errors or latency to analyze
+            active_endpoints = []
+            for (resource_path, method), values in zip(endpoints, count_values):
+                request_count = sum(values)
+                if request_count > 0:
+                    active_endpoints.append((resource_path, method, request_count))
             
-            results['analyzed_apis'].append(api_result)
+            metrics = [
+                (metric_name, endpoint_dimensions(api_id, resource_path, method), statistic)
+                for resource_path, method, _ in active_endpoints
+                for metric_name, statistic in ENDPOINT_METRICS
+            ]
+            values = get_metric_values(cloudwatch, metrics, start_time, end_time) if metrics else []
+            
+            for i, (resource_path, method, request_count) in enumerate(active_endpoints):
+                endpoint = f"{method}:{resource_path}"
+                error_4xx_values, error_5xx_values, latency_values = \
+                    values[i * len(ENDPOINT_METRICS):(i + 1) * len(ENDPOINT_METRICS)]
+                
+                api_result['total_requests'] += request_count
+                
+                # Get error count (4xx and 5xx)
+                total_errors = sum(error_4xx_values) + sum(error_5xx_values)
+                api_result['error_count'] += total_errors
+                
+                # Get latency
+                avg_latency = 0
+                if latency_values:
+                    avg_latency = statistics.fmean(latency_values)
+                
+                # Add to high traffic, keeping only the top endpoints below
+                api_findings['high_traffic_endpoints'].append({
+                    'api_id': api_id,
+                    'api_name': api_name,
+                    'endpoint': endpoint,
+                    'request_count': request_count
+                })
+                
+                # Check for high error rate
+                if (total_errors / request_count * 100) > ERROR_THRESHOLD:
+                    api_findings['high_error_endpoints'].append({
+                        'api_id': api_id,
+                        'api_name': api_name,
+                        'endpoint': endpoint,
+                        'error_rate': (total_errors / request_count * 100),
+                        'request_count': request_count,
+                        'error_count': total_errors
+                    })
+                
+                # Check for high latency
+                if avg_latency > LATENCY_THRESHOLD_MS:
+                    api_findings['high_latency_endpoints'].append({
+                        'api_id': api_id,
+                        'api_name': api_name,
+                        'endpoint': endpoint,
+                        'avg_latency_ms': avg_latency,
+                        'request_count': request_count
+                    })
             
         except Exception as e:
-            results['analyzed_apis'].append({
+            api_result = {
                 'api_id': api_id,
                 'error': str(e)
-            })
+            }
+        
+        return api_result, api_findings
+    
+    # APIs are independent, so analyze them concurrently
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for api_result, api_findings in executor.map(analyze_api, api_ids):
+            results['analyzed_apis'].append(api_result)
+            for category, items in api_findings.items():
+                results[category].extend(items)
     
-    # Sort high traffic endpoints
-    results['high_traffic_endpoints'] = sorted(
+    # Keep only the top 10 high traffic endpoints, without sorting all of them
+    results['high_traffic_endpoints'] = heapq.nlargest(
+        10,
         results['high_traffic_endpoints'],
-        key=lambda x: x['request_count'],
-        reverse=True
-    )[:10]  # Keep only top 10
+        key=itemgetter('request_count')
+    )
     
     # Generate report
-    if s3_report_bucket:
+    if S3_REPORT_BUCKET:
         try:
             report = {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': end_time.isoformat(),
                 'time_range': {
                     'start': start_time.isoformat(),
                     'end': end_time.isoformat()
@@ -240,11 +247,13 @@ def lambda_handler(event, context):
                 'results': results
             }
             
-            s3.put_object(
-                Bucket=s3_report_bucket,
-                Key=f"api-gateway-reports/{end_time.strftime('%Y-%m-%d')}.json",
-                Body=json.dumps(report, indent=2),
-                ContentType='application/json'
+            # The transfer manager switches to concurrent multipart uploads for large reports
+            s3.upload_fileobj(
+                io.BytesIO(json.dumps(report, separators=(',', ':'), default=str).encode()),
+                S3_REPORT_BUCKET,
+                f"api-gateway-reports/{end_time.strftime('%Y-%m-%d')}.json",
+                ExtraArgs={'ContentType': 'application/json'},
+                Config=REPORT_TRANSFER_CONFIG
             )
         except Exception as e:
             print(f"Error saving report to S3: {str(e)}")
@@ -258,5 +267,62 @@ def lambda_handler(event, context):
                 'end': end_time.isoformat()
             },
             'results': results
-        })
-    }
\ No newline at end of file
+        }, separators=(',', ':'), default=str)
+    }
+
+def endpoint_dimensions(api_id, resource_path, method):
+    """Return the CloudWatch dimensions of an API Gateway endpoint"""
+    return [
+        {'Name': 'ApiId', 'Value': api_id},
+        {'Name': 'Resource', 'Value': resource_path},
+        {'Name': 'Method', 'Value': method},
+        {'Name': 'Stage', 'Value': 'prod'}  # Assuming 'prod' stage, adjust as needed
+    ]
+
+def get_metric_values(cloudwatch, metrics, start_time, end_time):
+    """Fetch the daily values of (metric name, dimensions, statistic) API Gateway metrics"""
+    queries = [
+        {
+            'Id': f"m_{i}",
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': 'AWS/ApiGateway',
+                    'MetricName': metric_name,
+                    'Dimensions': dimensions
+                },
+                'Period': 86400,  # Daily
+                'Stat': statistic
+            },
+            'ReturnData': True
+        }
+        for i, (metric_name, dimensions, statistic) in enumerate(metrics)
+    ]
+    
+    values = [[] for _ in metrics]
+    paginator = cloudwatch.get_paginator('get_metric_data')
+    
+    for i in range(0, len(queries), MAX_METRIC_QUERIES_PER_CALL):
+        batch = queries[i:i + MAX_METRIC_QUERIES_PER_CALL]
+        for page in paginator.paginate(MetricDataQueries=batch, StartTime=start_time, EndTime=end_time):
+            for result in page['MetricDataResults']:
+                values[int(result['Id'].split('_', 1)[1])].extend(result['Values'])
+    
+    return values
+
+def list_items(apigw, operation_name, **kwargs):
+    """Return the items of every page of a paginated API Gateway listing"""
+    paginator = apigw.get_paginator(operation_name)
+    return [
+        item
+        for page in paginator.paginate(**kwargs, PaginationConfig={'PageSize': 500})
+        for item in page['items']
+    ]
+
+def cached(key, fetch):
+    """Return the cached result of fetch for key, calling it when missing or expired"""
+    now = time.monotonic()
+    entry = _api_cache.get(key)
+    if entry is None or entry[0] <= now:
+        entry = (now + API_CACHE_TTL_SECONDS, fetch())
+        _api_cache[key] = entry
+    return entry[1]